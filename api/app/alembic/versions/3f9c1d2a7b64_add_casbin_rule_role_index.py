@@ -0,0 +1,29 @@
+"""add casbin rule role index
+
+Revision ID: 3f9c1d2a7b64
+Revises: ee54ca148397
+Create Date: 2026-10-17 10:12:31.482113
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "3f9c1d2a7b64"
+down_revision = "ee54ca148397"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_casbin_rule_role",
+        "casbinrule",
+        ["ptype", "v1", "v0"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_casbin_rule_role", table_name="casbinrule")
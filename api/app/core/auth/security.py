@@ -10,8 +10,13 @@ from app.core.settings import settings
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
-def create_token(subject: str | Any, secret_key: str, expire: datetime) -> str:
-    to_encode = {"exp": expire, "sub": str(subject)}
+def create_token(
+    subject: str | Any,
+    secret_key: str,
+    expire: datetime,
+    claims: dict[str, Any] | None = None,
+) -> str:
+    to_encode = {"exp": expire, "sub": str(subject), **(claims or {})}
     return jwt.encode(to_encode, secret_key, algorithm=settings.TOKEN.ALGORITHM)
 
 
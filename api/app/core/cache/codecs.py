@@ -0,0 +1,76 @@
+import io
+from typing import Any, Literal
+
+import lz4.frame
+import orjson
+import snappy
+
+__all__ = ["CacheCodec", "Compression", "Serializer"]
+
+Serializer = Literal["raw", "json"]
+Compression = Literal["none", "lz4", "snappy"]
+
+# Both framing formats start with a magic header, so compressed values are recognized on read
+# whatever the current setting is, and values written uncompressed stay readable.
+LZ4_FRAME_MAGIC = b"\x04\x22\x4d\x18"
+SNAPPY_STREAM_MAGIC = b"\xff\x06\x00\x00sNaPpY"
+
+
+class CacheCodec:
+    """Turns cache values into the bytes stored in Redis and back.
+
+    `raw` stores str/bytes as is and reads bytes back, `json` serializes with orjson.
+    Encoded values of at least `compress_min_size` bytes are compressed with `compression`.
+    """
+
+    def __init__(
+        self,
+        serializer: Serializer = "json",
+        compression: Compression = "none",
+        compress_min_size: int = 1024,
+    ) -> None:
+        self.serializer = serializer
+        self.compression = compression
+        self.compress_min_size = compress_min_size
+
+    def _serialize(self, value: Any) -> bytes:
+        if self.serializer == "json":
+            return orjson.dumps(value)
+        if isinstance(value, str):
+            return value.encode()
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value)
+        # Numbers etc., as redis-py would store them
+        return str(value).encode()
+
+    def _deserialize(self, data: bytes) -> Any:
+        if self.serializer == "json":
+            return orjson.loads(data)
+        return data
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "none" or len(data) < self.compress_min_size:
+            return data
+        if self.compression == "lz4":
+            return lz4.frame.compress(data)
+        compressed = io.BytesIO()
+        snappy.stream_compress(io.BytesIO(data), compressed)
+        return compressed.getvalue()
+
+    @staticmethod
+    def _decompress(data: bytes) -> bytes:
+        if data.startswith(LZ4_FRAME_MAGIC):
+            return lz4.frame.decompress(data)
+        if data.startswith(SNAPPY_STREAM_MAGIC):
+            decompressed = io.BytesIO()
+            snappy.stream_decompress(io.BytesIO(data), decompressed)
+            return decompressed.getvalue()
+        return data
+
+    def encode(self, value: Any) -> bytes:
+        return self._compress(self._serialize(value))
+
+    def decode(self, data: bytes | None) -> Any | None:
+        if data is None:
+            return None
+        return self._deserialize(self._decompress(data))
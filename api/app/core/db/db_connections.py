@@ -1,46 +1,178 @@
+import math
+import time
+import uuid
 from contextlib import asynccontextmanager
 from functools import wraps
-from typing import AsyncGenerator, Awaitable, Callable, ParamSpec, TypeVar
+from typing import Any, AsyncGenerator, Awaitable, Callable, Literal, ParamSpec, TypeVar
 
 from loguru import logger
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
     AsyncEngine,
     AsyncSession,
     create_async_engine,
 )
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 
+from app.core.metrics import metrics
 from app.core.settings import settings
 
 Param = ParamSpec("Param")
 RetType = TypeVar("RetType")
 
+SessionMode = Literal["read_write", "readonly", "serializable"]
+
+# Execution options of the engine sessions of each mode are bound to, `read_write` sessions
+# run at SQLALCHEMY.ISOLATION_LEVEL
+SESSION_MODE_OPTIONS: dict[SessionMode, dict[str, Any]] = {
+    "read_write": {},
+    # Transactions begin as READ ONLY, the equivalent of SET TRANSACTION READ ONLY
+    "readonly": {"isolation_level": "READ COMMITTED", "postgresql_readonly": True},
+    "serializable": {"isolation_level": "SERIALIZABLE"},
+}
+
+# Seconds the replica is behind the primary, 0 when it replayed the primary's WAL position
+# :lsn (the last replay timestamp alone keeps growing while the primary is idle), NULL when
+# it never replayed a transaction. What it received doesn't count: a standby disconnected
+# from the primary has replayed all of it too
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)"
+    " THEN 0"
+    " ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+    " END"
+)
+PRIMARY_LSN_QUERY = text("SELECT pg_current_wal_lsn()::text")
+REPLICA_REPLAYED_QUERY = text(
+    "SELECT COALESCE(pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn), true)"
+)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every statement round trip into the `db_statement_seconds` metric.
+
+    Statements are counted in `db_statements_total`; along with the prepares counted by
+    `prepared_statement_name`, the prepared statement cache hits are their difference.
+    Connections checked out of the pool are counted in `db_connection_checkouts_total`.
+    """
+
+    @event.listens_for(engine, "checkout")
+    def checkout(*args):  # type: ignore
+        metrics.inc("db_connection_checkouts_total")
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, *args):  # type: ignore
+        metrics.inc("db_statements_total")
+        conn.info["metrics_started_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, *args):  # type: ignore
+        started_at = conn.info.pop("metrics_started_at", None)
+        if started_at is not None:
+            metrics.observe("db_statement_seconds", time.perf_counter() - started_at)
+
+
+def prepared_statement_name() -> str:
+    """Unique name of a statement being prepared, only called on prepared statement cache misses."""
+    metrics.inc("db_statement_prepares_total")
+    return f"__asyncpg_{uuid.uuid4()}__"
+
+
+def get_connect_args() -> dict[str, Any]:
+    cache_size = settings.SQLALCHEMY.PREPARED_STATEMENT_CACHE_SIZE
+    connect_args: dict[str, Any] = {
+        # SQLAlchemy's cache of the statements it prepares and asyncpg's own, for the
+        # statements asyncpg runs by itself (type introspection)
+        "prepared_statement_cache_size": cache_size,
+        "statement_cache_size": cache_size,
+    }
+    if settings.SQLALCHEMY.PREPARED_STATEMENT_UNIQUE_NAMES:
+        connect_args["prepared_statement_name_func"] = prepared_statement_name
+    return connect_args
+
+
+def get_pool_options() -> dict[str, Any]:
+    """Engine pool arguments for `SQLALCHEMY.POOL_CLASS`.
+
+    A pooled connection is only checked out for the length of a session, which is one
+    transaction, so it matches pgbouncer's transaction pooling: pgbouncer still assigns
+    a server connection per transaction, the client side just skips connect and auth.
+    """
+    if settings.SQLALCHEMY.POOL_CLASS == "null":
+        return {"poolclass": NullPool, "pool_pre_ping": settings.SQLALCHEMY.POOL_PRE_PING}
+
+    return {
+        "poolclass": AsyncAdaptedQueuePool,
+        "pool_size": settings.SQLALCHEMY.POOL_SIZE,
+        "max_overflow": settings.SQLALCHEMY.POOL_MAX_OVERFLOW,
+        "pool_timeout": settings.SQLALCHEMY.POOL_TIMEOUT,
+        "pool_recycle": settings.SQLALCHEMY.POOL_RECYCLE,
+        "pool_pre_ping": settings.SQLALCHEMY.POOL_PRE_PING,
+        "pool_use_lifo": settings.SQLALCHEMY.POOL_USE_LIFO,
+    }
+
 
 class AsyncDbConnection:
     def __init__(self) -> None:
         self.engine: AsyncEngine | None = None
         self.session_maker: async_sessionmaker[AsyncSession] | None = None
+        self.session_makers: dict[SessionMode, async_sessionmaker[AsyncSession]] = {}
+        self.replica_engines: list[AsyncEngine] = []
+        self.replica_session_makers: list[async_sessionmaker[AsyncSession]] = []
+        # (checked at, lag in seconds) per replica
+        self._replica_lags: list[tuple[float, float]] = []
+        self._next_replica = 0
 
     def init(self) -> None:
         # https://docs.sqlalchemy.org/en/20/dialects/postgresql.html#prepared-statement-name-with-pgbouncer
         self.engine = create_async_engine(
             settings.POSTGRES.ASYNC_DATABASE_URI,
             echo=settings.SQLALCHEMY.ECHO,
-            pool_pre_ping=True,
             future=True,
-            poolclass=NullPool,
-            # connect_args={
-            #     "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
-            # },
-            isolation_level="REPEATABLE READ",
-        )
-        self.session_maker = async_sessionmaker(
-            self.engine,
-            expire_on_commit=False,
-            autoflush=False,
-            autocommit=False,
+            **get_pool_options(),
+            connect_args=get_connect_args(),
+            isolation_level=settings.SQLALCHEMY.ISOLATION_LEVEL,
         )
+        if settings.METRICS.ENABLED:
+            instrument_engine(self.engine.sync_engine)
+        # Engines with execution options share the pool, connections are reset on check in
+        self.session_makers = {
+            mode: async_sessionmaker(
+                self.engine.execution_options(**options) if options else self.engine,
+                expire_on_commit=False,
+                autoflush=False,
+                autocommit=False,
+            )
+            for mode, options in SESSION_MODE_OPTIONS.items()
+        }
+        self.session_maker = self.session_makers["read_write"]
+
+        self.replica_engines = [
+            create_async_engine(
+                uri,
+                echo=settings.SQLALCHEMY.ECHO,
+                future=True,
+                **get_pool_options(),
+                connect_args=get_connect_args(),
+            )
+            for uri in settings.POSTGRES.ASYNC_REPLICA_DATABASE_URIS
+        ]
+        for engine in self.replica_engines:
+            if settings.METRICS.ENABLED:
+                instrument_engine(engine.sync_engine)
+        self.replica_session_makers = [
+            async_sessionmaker(
+                engine.execution_options(**SESSION_MODE_OPTIONS["readonly"]),
+                expire_on_commit=False,
+                autoflush=False,
+                autocommit=False,
+            )
+            for engine in self.replica_engines
+        ]
+        # Never checked, so checked on first use
+        self._replica_lags = [(-math.inf, math.inf)] * len(self.replica_engines)
 
     async def close(self) -> None:
         if self.engine is None:
@@ -48,14 +180,114 @@ class AsyncDbConnection:
             return
 
         await self.engine.dispose()
+        for engine in self.replica_engines:
+            await engine.dispose()
         self.engine = None
         self.session_marker = None
+        self.session_makers = {}
+        self.replica_engines = []
+        self.replica_session_makers = []
+        self._replica_lags = []
+
+    @asynccontextmanager
+    async def session(
+        self, mode: SessionMode = "read_write"
+    ) -> AsyncGenerator[AsyncSession, None]:
+        """Session checking out a connection on its first statement only (autobegin).
+
+        A session that runs no statement, e.g. one a request only needed for cache misses,
+        never reaches the pool nor pgbouncer; don't begin transactions eagerly on it.
+
+        `readonly` sessions run READ COMMITTED read only transactions, `serializable` ones
+        must be ready for serialization failures.
+        """
+        assert self.session_makers, "must call async_db_connection.init() before"
+
+        async with self.session_makers[mode]() as session:
+            yield session
+
+    async def _get_replica_lag(self, index: int) -> float:
+        checked_at, lag = self._replica_lags[index]
+        if time.monotonic() - checked_at < settings.POSTGRES.REPLICA_LAG_CHECK_INTERVAL:
+            return lag
+
+        # Requests arriving during the check keep using the previous result
+        self._replica_lags[index] = (time.monotonic(), lag)
+        try:
+            async with self.session("readonly") as db:
+                primary_lsn = (await db.execute(PRIMARY_LSN_QUERY)).scalar_one()
+            async with self.replica_session_makers[index]() as session:
+                seconds = (
+                    await session.execute(REPLICA_LAG_QUERY, {"lsn": primary_lsn})
+                ).scalar_one()
+            lag = math.inf if seconds is None else float(seconds)
+        except Exception:  # noqa: B902
+            logger.exception("can't check the lag of replica {index}", index=index)
+            lag = math.inf
+
+        self._replica_lags[index] = (time.monotonic(), lag)
+        return lag
+
+    async def _pick_replica(self) -> int | None:
+        """Next replica, round robin, skipping replicas behind by more than REPLICA_MAX_LAG."""
+        for _ in range(len(self.replica_session_makers)):
+            index = self._next_replica
+            self._next_replica = (index + 1) % len(self.replica_session_makers)
+            if await self._get_replica_lag(index) <= settings.POSTGRES.REPLICA_MAX_LAG:
+                return index
+        return None
+
+    async def _open_replica_session(
+        self, index: int, primary_lsn: str | None
+    ) -> AsyncSession | None:
+        """Session on the replica, connected already; None when the replica can't be reached
+        or hasn't replayed `primary_lsn` yet.
+        """
+        session = self.replica_session_makers[index]()
+        try:
+            if primary_lsn is None:
+                await session.connection()
+                return session
+            if (await session.execute(REPLICA_REPLAYED_QUERY, {"lsn": primary_lsn})).scalar_one():
+                return session
+        except Exception:  # noqa: B902
+            logger.exception("can't open a session on replica {index}", index=index)
+            # Skipped until its next lag check
+            self._replica_lags[index] = (time.monotonic(), math.inf)
+        await session.close()
+        return None
 
     @asynccontextmanager
-    async def session(self) -> AsyncGenerator[AsyncSession, None]:
-        assert self.session_maker is not None, "must call async_db_connection.init() before"
+    async def replica_session(self, consistent: bool = False) -> AsyncGenerator[AsyncSession, None]:
+        """Read only session on a replica, on the primary when no replica is caught up.
+
+        `consistent` sessions also see every transaction committed before they were opened:
+        the replica must have replayed the primary's current WAL position, which costs a
+        round trip to the primary.
+
+        The replica is connected to before the session is handed out, a replica failing
+        then falls back to the primary too.
+        """
+        assert self.session_makers, "must call async_db_connection.init() before"
+
+        index = await self._pick_replica() if self.replica_session_makers else None
+        replica_session = None
+        if index is not None:
+            primary_lsn = None
+            if consistent:
+                async with self.session("readonly") as db:
+                    primary_lsn = (await db.execute(PRIMARY_LSN_QUERY)).scalar_one()
+            replica_session = await self._open_replica_session(index, primary_lsn)
+
+        if replica_session is not None:
+            metrics.inc("db_replica_sessions_total")
+            async with replica_session:
+                yield replica_session
+            return
 
-        async with self.session_maker() as session:
+        if self.replica_session_makers:
+            metrics.inc("db_replica_fallbacks_total")
+        async with self.session("readonly") as session:
             yield session
 
     def inject(
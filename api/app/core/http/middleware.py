@@ -3,6 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 
+from app.core.metrics import MetricsMiddleware
 from app.core.settings import settings
 
 
@@ -26,3 +27,7 @@ def setup_middleware(app: FastAPI) -> None:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+
+    # Add metrics middleware outermost, so request timings include every other middleware
+    if settings.METRICS.ENABLED:
+        app.add_middleware(MetricsMiddleware)
@@ -6,7 +6,11 @@ from loguru import logger
 from taskiq_aio_pika import AioPikaBroker
 
 from app.core.connections import connections
+from app.core.settings import settings
 from app.src.author.casbin_enforcer import init_casbin_enforcer
+from app.src.author.casbin_listener import CasbinPolicyListener
+from app.src.users.cache_listener import UserCacheListener
+from app.src.users.cache_repository import user_cache_repository
 
 
 async def init_connections() -> None:
@@ -32,15 +36,46 @@ async def finalize_services(services: dict[str, Any]) -> None:
     if "casbin_enforcer" in services:
         casbin_enforcer = services["casbin_enforcer"]
 
-        # Save casbin policy with locking
-        async with connections.lock.lock(
-            name="api-casbin-save-policy",
-            lock_timeout=5 * 60,
-            acquire_timeout=5 * 60,
-            acquire_failed_msg="Cannot acquire redis startup lock",
-            raise_error=True,
+        # Save casbin policy with locking, skipped when auto-save already stored every local
+        # mutation, when the snapshot is unchanged since load or only holds a filtered subset
+        # of the rules
+        if (
+            casbin_enforcer.policy_modified
+            and not casbin_enforcer.auto_save
+            and not casbin_enforcer.is_filtered()
         ):
-            await casbin_enforcer.save_policy()  # type: ignore[attr-defined]
+            async with connections.lock.lock(
+                name="api-casbin-save-policy",
+                lock_timeout=5 * 60,
+                acquire_timeout=5 * 60,
+                acquire_failed_msg="Cannot acquire redis startup lock",
+                raise_error=True,
+            ):
+                if not await casbin_enforcer.save_policy_if_current():
+                    logger.warning("casbin policy changed since it was loaded, not saving it")
+
+
+async def init_listeners(services: dict[str, Any]) -> dict[str, Any]:
+    """Start background listeners keeping in-process state in sync across workers."""
+    listeners: dict[str, Any] = {}
+
+    if settings.CASBIN.POLICY_LISTENER_ENABLED and "casbin_enforcer" in services:
+        casbin_policy_listener = CasbinPolicyListener(services["casbin_enforcer"])
+        casbin_policy_listener.start()
+        listeners["casbin_policy_listener"] = casbin_policy_listener
+
+    if settings.REDIS_CACHE.USER_LOCAL_CACHE_SIZE > 0:
+        user_cache_listener = UserCacheListener(user_cache_repository)
+        user_cache_listener.start()
+        listeners["user_cache_listener"] = user_cache_listener
+
+    return listeners
+
+
+async def close_listeners(listeners: dict[str, Any]) -> None:
+    """Stop background listeners."""
+    for listener in listeners.values():
+        await listener.stop()
 
 
 def get_lifespan(
@@ -61,6 +96,9 @@ def get_lifespan(
         # Initialize services
         services = await init_services()
 
+        # Initialize listeners
+        listeners = await init_listeners(services)
+
         if not broker.is_worker_process:
             await broker.startup()
 
@@ -69,6 +107,9 @@ def get_lifespan(
         if not broker.is_worker_process:
             await broker.shutdown()
 
+        # Close listeners
+        await close_listeners(listeners)
+
         # Finalize services
         await finalize_services(services)
 
@@ -0,0 +1,152 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Awaitable, Callable, Iterator, ParamSpec, TypeVar
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.settings import settings
+
+__all__ = ["metrics", "Metrics", "MetricsMiddleware"]
+
+Param = ParamSpec("Param")
+RetType = TypeVar("RetType")
+
+# Route label of work done outside of a request: policy listener, startup, shutdown
+UNROUTED = "-"
+
+_request_scope: ContextVar[Scope | None] = ContextVar("metrics_request_scope", default=None)
+
+
+def current_route() -> str:
+    """Route template of the request being served, resolved once routing matched it."""
+    scope = _request_scope.get()
+    if scope is None:
+        return UNROUTED
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or UNROUTED
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Timer:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class Metrics:
+    """Per-process counters and timers, labelled by route template and optional labels.
+
+    Counters are exposed as `<prefix>_<name>`, timers as `_count`, `_sum` and `_max` series,
+    in the Prometheus text format. Every worker process keeps its own registry, so every
+    series carries a `pid` label: a scrape reaches one worker, series of different workers
+    must be summed by the query (e.g. `sum without (pid) (rate(...))`), not compared.
+    """
+
+    def __init__(self) -> None:
+        self._counters: dict[tuple[str, tuple[tuple[str, str], ...]], int] = {}
+        self._timers: dict[tuple[str, tuple[tuple[str, str], ...]], _Timer] = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict[str, str]) -> tuple[str, tuple[tuple[str, str], ...]]:
+        return name, (("route", current_route()), *sorted(labels.items()))
+
+    def inc(self, name: str, value: int = 1, **labels: str) -> None:
+        if not settings.METRICS.ENABLED:
+            return
+        key = self._key(name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        if not settings.METRICS.ENABLED:
+            return
+        key = self._key(name, labels)
+        timer = self._timers.get(key)
+        if timer is None:
+            timer = self._timers[key] = _Timer()
+        timer.count += 1
+        timer.total += seconds
+        timer.max = max(timer.max, seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started_at, **labels)
+
+    def timed(
+        self, name: str, **labels: str
+    ) -> Callable[[Callable[Param, Awaitable[RetType]]], Callable[Param, Awaitable[RetType]]]:
+        def decorator(
+            func: Callable[Param, Awaitable[RetType]],
+        ) -> Callable[Param, Awaitable[RetType]]:
+            @wraps(func)
+            async def wrapper(*args: Param.args, **kwargs: Param.kwargs) -> RetType:
+                with self.timer(name, **labels):
+                    return await func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def clear(self) -> None:
+        self._counters.clear()
+        self._timers.clear()
+
+    def render(self) -> str:
+        prefix = settings.METRICS.PREFIX
+        # Read on every render, forked workers don't share the parent's pid
+        pid = str(os.getpid())
+        lines: list[str] = []
+
+        def series(name: str, labels: tuple[tuple[str, str], ...], value: Any) -> str:
+            rendered = ",".join(f'{label}="{_escape(v)}"' for label, v in (("pid", pid), *labels))
+            return f"{prefix}_{name}{{{rendered}}} {value}"
+
+        for name in sorted({name for name, _ in self._counters}):
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for (counter_name, labels), value in sorted(self._counters.items()):
+                if counter_name == name:
+                    lines.append(series(name, labels, value))
+
+        for name in sorted({name for name, _ in self._timers}):
+            lines.append(f"# TYPE {prefix}_{name} summary")
+            for (timer_name, labels), timer in sorted(self._timers.items()):
+                if timer_name == name:
+                    lines.append(series(f"{name}_count", labels, timer.count))
+                    lines.append(series(f"{name}_sum", labels, f"{timer.total:.6f}"))
+                    lines.append(series(f"{name}_max", labels, f"{timer.max:.6f}"))
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Exposes the request scope to `metrics` and times every HTTP request by route."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = _request_scope.set(scope)
+        try:
+            with metrics.timer("http_request_seconds"):
+                await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
+
+
+metrics = Metrics()
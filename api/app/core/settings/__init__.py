@@ -13,7 +13,7 @@ from .app import AppSettings
 from .casbin import CasbinSettings
 from .database import PostgresSettings, SQLAlchemySettings
 from .email import EmailSettings
-from .monitoring import SentrySettings
+from .monitoring import MetricsSettings, SentrySettings
 from .ratelimit import RateLimitSettings
 from .redis import RedisCacheSettings, RedisLockSettings
 from .taskiq import TaskiqSettings
@@ -35,6 +35,7 @@ class Settings(BaseSettings):
     POSTGRES: PostgresSettings
     SQLALCHEMY: SQLAlchemySettings = SQLAlchemySettings()
     SENTRY: SentrySettings = SentrySettings()
+    METRICS: MetricsSettings = MetricsSettings()
     USER: UserSettings
     REDIS_CACHE: RedisCacheSettings = RedisCacheSettings()
     REDIS_LOCK: RedisLockSettings = RedisLockSettings()
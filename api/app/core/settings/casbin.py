@@ -6,3 +6,23 @@ class CasbinSettings(BaseModel):
     PATH_POLICY: str = "/app/app/configs/author/rbac_policy.csv"
 
     DEFAULT_ROLE: str = "role:data_admin"
+
+    # Workers subscribe to policy version bumps; while subscribed, requests only poll the
+    # Redis version every POLICY_VERSION_CHECK_INTERVAL seconds as a safety net.
+    POLICY_LISTENER_ENABLED: bool = True
+    POLICY_LISTENER_RETRY_INTERVAL: float = 1.0
+    POLICY_VERSION_CHECK_INTERVAL: float = 5.0
+
+    # Max memoized (subject, path, method) decisions per worker, 0 disables the cache
+    DECISION_CACHE_SIZE: int = 10_000
+
+    # Answer enforce() from a precompiled index of the policy; only valid for the shipped
+    # casbin_model.conf matcher (keyMatch/keyMatch3 paths, regexMatch methods, one `g`)
+    COMPILED_AUTHORIZER: bool = False
+
+    # Load only `p` rules and role -> role `g` rules, resolving each subject's roles from the
+    # DB on demand. Management endpoints then only see the loaded rules and saving the
+    # policy is disabled.
+    FILTERED_POLICY: bool = False
+    SUBJECT_ROLES_TTL: float = 30.0
+    SUBJECT_ROLES_CACHE_SIZE: int = 10_000
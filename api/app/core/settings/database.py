@@ -1,5 +1,5 @@
 from functools import cached_property
-from typing import Annotated, Any
+from typing import Annotated, Any, Literal
 
 from pydantic import (
     BaseModel,
@@ -18,6 +18,11 @@ class PostgresSettings(BaseModel):
     PASSWORD: str
     DB: str
     DATABASE_URI: Annotated[PostgresDsn | None, Field(validate_default=True)] = None
+    # Hot standbys serving read-only routes, all reads go to the primary when empty
+    REPLICA_DATABASE_URIS: list[PostgresDsn] = []
+    # Replicas further behind the primary are skipped, lags are checked at most this often
+    REPLICA_MAX_LAG: float = 5.0
+    REPLICA_LAG_CHECK_INTERVAL: float = 5.0
 
     @field_validator("DATABASE_URI", mode="after")
     @classmethod
@@ -48,6 +53,39 @@ class PostgresSettings(BaseModel):
             else str(self.DATABASE_URI)
         )
 
+    @computed_field(return_type=list[str])  # type: ignore[misc]
+    @cached_property
+    def ASYNC_REPLICA_DATABASE_URIS(self) -> list[str]:
+        return [
+            str(uri).replace("postgresql://", "postgresql+asyncpg://")
+            for uri in self.REPLICA_DATABASE_URIS
+        ]
+
 
 class SQLAlchemySettings(BaseModel):
     ECHO: bool = False
+    # Isolation of read-write sessions, read only ones always run READ COMMITTED
+    ISOLATION_LEVEL: Literal[
+        "READ COMMITTED", "REPEATABLE READ", "SERIALIZABLE"
+    ] = "REPEATABLE READ"
+
+    # `queue` keeps up to POOL_SIZE warm connections per process (plus MAX_OVERFLOW under load),
+    # `null` opens a new connection to pgbouncer for every session
+    POOL_CLASS: Literal["queue", "null"] = "queue"
+    POOL_SIZE: int = 5
+    POOL_MAX_OVERFLOW: int = 5
+    # Seconds to wait for a connection when the pool is exhausted
+    POOL_TIMEOUT: float = 30.0
+    # Close connections older than this many seconds, -1 never recycles them
+    POOL_RECYCLE: int = 30 * 60
+    # Test connections on checkout, pgbouncer may have closed them (server_idle_timeout etc.)
+    POOL_PRE_PING: bool = True
+    # Reuse the most recent connection first, so the extra ones idle out and get recycled
+    POOL_USE_LIFO: bool = True
+
+    # Statements prepared and kept per connection, so repeated queries skip parse and plan;
+    # 0 prepares every statement again. Keep pgbouncer's max_prepared_statements above it.
+    PREPARED_STATEMENT_CACHE_SIZE: int = 100
+    # Give every prepared statement a unique name: behind pgbouncer a client connection
+    # talks to several server connections, where asyncpg's per-connection names collide
+    PREPARED_STATEMENT_UNIQUE_NAMES: bool = True
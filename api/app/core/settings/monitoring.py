@@ -18,3 +18,12 @@ class SentrySettings(BaseModel):
     @classmethod
     def sentry_dsn_can_be_blank(cls, v: str | None) -> str | None:  # pylint: disable=no-self-argument
         return v or None
+
+
+class MetricsSettings(BaseModel):
+    # In-process timing counters exposed on /metrics, see app.core.metrics
+    ENABLED: bool = True
+    PREFIX: str = "api"
+    # Bearer token /metrics requires when set. The series expose per-route timings of
+    # authentication and authorization, keep the endpoint off public networks otherwise
+    TOKEN: str | None = None
@@ -1,4 +1,4 @@
-from typing import Annotated, Any
+from typing import Annotated, Any, Literal
 
 from pydantic import BaseModel, Field, field_validator, RedisDsn, ValidationInfo
 
@@ -12,6 +12,14 @@ class RedisLockSettings(BaseModel):
     WORKER_MAX_CONNECTIONS: int = 10
 
 
+class CacheCodecSettings(BaseModel):
+    # `raw` stores str/bytes as given, `json` serializes values with orjson
+    SERIALIZER: Literal["raw", "json"] = "json"
+    COMPRESSION: Literal["none", "lz4", "snappy"] = "none"
+    # Encoded values smaller than this are stored uncompressed
+    COMPRESS_MIN_SIZE: int = 1024
+
+
 class RedisCacheSettings(BaseModel):
     HOST: str = "redis"
     PORT: int = 6379
@@ -36,4 +44,20 @@ class RedisCacheSettings(BaseModel):
         )
 
     USER_TTL: int = 60 * 60
+    # Per-process LRU in front of the user cache, kept in sync over pub/sub; 0 disables it
+    USER_LOCAL_CACHE_SIZE: int = 10_000
+    USER_LOCAL_CACHE_TTL: float = 30.0
+    USER_LOCAL_CACHE_RETRY_INTERVAL: float = 1.0
     CASBIN_TTL: int = 60 * 60
+    ITEM_TTL: int = 5 * 60
+    # Missing items are remembered this long, stale ones served this long while reloaded
+    ITEM_NEGATIVE_TTL: int = 30
+    ITEM_STALE_TTL: int = 60
+    CASBIN_REBUILD_LOCK_TIMEOUT: int = 10
+
+    # Value encoding per cache repository name, CacheCodecSettings() for the others
+    CODECS: dict[str, CacheCodecSettings] = {
+        "casbin_rule": CacheCodecSettings(
+            SERIALIZER="raw", COMPRESSION="lz4", COMPRESS_MIN_SIZE=0
+        ),
+    }
@@ -15,3 +15,10 @@ class TokenSettings(BaseModel):
     COOKIE_HTTPONLY: bool = True
     COOKIE_SECURE: bool = True
     COOKIE_SAMESITE: Literal["lax", "strict", "none"] | None = "none"
+
+    # Embed the user id and active flag in access tokens and authenticate requests from the
+    # token alone. Tokens issued before a user's last security change (password, status,
+    # logout everywhere) are rejected; workers refresh that list every
+    # REVOCATION_CHECK_INTERVAL seconds.
+    STATELESS_ACCESS_TOKEN: bool = False
+    REVOCATION_CHECK_INTERVAL: float = 5.0
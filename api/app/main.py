@@ -1,5 +1,9 @@
+import secrets
+from typing import Annotated
+
 import sentry_sdk
-from fastapi import status
+from fastapi import Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
 from loguru import logger
 from pydantic import BaseModel
 from sentry_sdk.integrations.fastapi import FastApiIntegration
@@ -8,6 +12,7 @@ from sentry_sdk.integrations.starlette import StarletteIntegration
 
 from app.core.app_factory import create_app
 from app.core.logging.custom_logging import make_customize_logger
+from app.core.metrics import metrics
 from app.core.settings import settings
 from app.src.db_models import *  # noqa # NOSONAR
 from app.src.db_signals import *  # noqa # NOSONAR
@@ -74,4 +79,28 @@ def get_health() -> HealthCheck:
     return HealthCheck(status="OK")
 
 
+@app.get(
+    "/metrics",
+    tags=["healthcheck"],
+    summary="Export process metrics",
+    response_description="Metrics in the Prometheus text format",
+    status_code=status.HTTP_200_OK,
+    response_class=PlainTextResponse,
+)
+def get_metrics(authorization: Annotated[str | None, Header()] = None) -> str:
+    """
+    ## Export process metrics
+    Timing counters of this worker process (request, authorization, policy reloads,
+    enforce calls, decision cache, adapter and DB round trips), labelled by route template
+    and by the pid of the worker that served the scrape.
+    Requires `Authorization: Bearer <METRICS.TOKEN>` when the token is set.
+    """
+    token = settings.METRICS.TOKEN
+    if token is not None and not secrets.compare_digest(
+        (authorization or "").encode(), f"Bearer {token}".encode()
+    ):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return metrics.render()
+
+
 # Middleware, exception handlers, static files, and routes are configured in app_factory
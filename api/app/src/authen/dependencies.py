@@ -1,6 +1,5 @@
 from typing import Annotated
 
-import casbin
 from fastapi import Cookie, Depends, Header
 from fastapi.openapi.models import OAuthFlows as OAuthFlowsModel
 from fastapi.security import OAuth2
@@ -12,9 +11,11 @@ from starlette.requests import Request
 
 from app import errors as app_errors
 from app.core.auth.security import decode_token
+from app.core.metrics import metrics
 from app.core.settings import settings
+from app.src.author.casbin_enforcer import CasbinEnforcer
 from app.src.dependencies import get_async_cache, get_casbin_enforcer, get_db
-from app.src.users.db_models import User
+from app.src.users.principal import UserPrincipal
 
 from . import errors
 from .services import authen_service
@@ -54,13 +55,35 @@ def is_local_token(token: str) -> bool:
         return False
 
 
+def get_authorization_path(request: Request) -> str:
+    """Return the path checked against casbin policies.
+
+    The matched route template (`/v0/items/{id}/`) is used instead of the concrete URL
+    (`/v0/items/12345/`), so decisions can be memoized per route rather than per URL.
+    `keyMatch3` still matches templates, as `{id}` in the policy matches any path segment.
+    """
+    route = request.scope.get("route")
+    path = getattr(route, "path_format", None) or request.url.path
+    path = path.removeprefix(settings.APP.API_PREFIX)
+
+    if not path.endswith("/"):
+        path = f"{path}/"
+
+    return path
+
+
 async def get_current_user_from_oauth2(
     *,
     request: Request,
     db: Annotated[AsyncSession, Depends(get_db)],
     async_cache: Annotated[Redis, Depends(get_async_cache)],
     token_oauth2: Annotated[str, Depends(reusable_oauth2)],
-) -> User:
+) -> UserPrincipal:
+    if settings.TOKEN.STATELESS_ACCESS_TOKEN:
+        principal = await authen_service.get_principal_from_token(token=token_oauth2)
+        if principal is not None:
+            return principal
+
     user = await authen_service.get_user_from_token(
         db, cache_connection=async_cache, token=token_oauth2
     )
@@ -75,7 +98,7 @@ async def get_current_user(
     db: Annotated[AsyncSession, Depends(get_db)],
     async_cache: Annotated[Redis, Depends(get_async_cache)],
     token_oauth2: Annotated[str | None, Depends(reusable_oauth2)],
-) -> User:
+) -> UserPrincipal:
     if token_oauth2 is not None:
         return await get_current_user_from_oauth2(
             request=request,
@@ -88,8 +111,8 @@ async def get_current_user(
 
 
 async def get_current_active_user(
-    current_user: Annotated[User, Depends(get_current_user)],
-) -> User:
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
+) -> UserPrincipal:
     if not current_user.is_active:
         raise errors.inactive_user("inactive user")
     return current_user
@@ -98,17 +121,16 @@ async def get_current_active_user(
 async def get_current_active_authorized(
     *,
     request: Request,
-    current_user: Annotated[User, Depends(get_current_active_user)],
-    casbin_enforcer: Annotated[casbin.AsyncEnforcer, Depends(get_casbin_enforcer)],
-) -> User:
+    current_user: Annotated[UserPrincipal, Depends(get_current_active_user)],
+    casbin_enforcer: Annotated[CasbinEnforcer, Depends(get_casbin_enforcer)],
+) -> UserPrincipal:
     method = request.method
-    path = request.url.path.replace(f"{settings.APP.API_PREFIX}", "")
-
-    if not path.endswith("/"):
-        path = f"{path}/"
+    path = get_authorization_path(request)
 
-    await casbin_enforcer.load_policy()
-    if not casbin_enforcer.enforce(current_user.email, path, method):
+    with metrics.timer("authorization_seconds"):
+        await casbin_enforcer.load_policy_if_stale()
+        allowed = await casbin_enforcer.enforce_subject(current_user.email, path, method)
+    if not allowed:
         raise app_errors.forbidden("user doesn't have enough privileges")
 
     return current_user
@@ -119,7 +141,7 @@ async def get_current_media_user(
     db: Annotated[AsyncSession, Depends(get_db)],
     async_cache: Annotated[Redis, Depends(get_async_cache)],
     token_oauth2: Annotated[str | None, Depends(reusable_oauth2)],
-) -> User | None:
+) -> UserPrincipal | None:
     if not settings.APP.PROTECT_MEDIA:
         return None
 
@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+from app.core.cache.cache_connections import async_cache_connection
+from app.core.settings import settings
+from app.src.users.services import user_service
+
+__all__ = ["token_revocation_list", "TokenRevocationList"]
+
+
+# Changes are re-read this many seconds back: a change stamped before a refresh may only
+# be written to Redis after it
+SECURITY_CHANGES_OVERLAP = 60.0
+SECURITY_CHANGES_PRUNE_INTERVAL = 60 * 60
+
+
+class TokenRevocationList:
+    """In-process copy of the users' last security change, for stateless access tokens.
+
+    It holds every user that changed within an access token lifetime. It is refreshed at
+    most every `TOKEN.REVOCATION_CHECK_INTERVAL` seconds, and each refresh only reads the
+    changes made since the previous one. A token is only rejected when it was issued before
+    its user's last change.
+    """
+
+    def __init__(self) -> None:
+        self._changed_at: dict[str, float] = {}
+        self._checked_at: float | None = None
+        # Wall clock time of the last refresh, and of the last pruning of expired changes
+        self._fetched_at: float | None = None
+        self._pruned_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _is_stale(self) -> bool:
+        return (
+            self._checked_at is None
+            or time.monotonic() - self._checked_at >= settings.TOKEN.REVOCATION_CHECK_INTERVAL
+        )
+
+    def _prune(self, now: float) -> None:
+        if now - self._pruned_at < SECURITY_CHANGES_PRUNE_INTERVAL:
+            return
+        # Tokens issued before these changes have expired
+        expired_at = now - settings.TOKEN.ACCESS_TOKEN_EXPIRE_DURATION * 60
+        self._changed_at = {
+            email: changed_at
+            for email, changed_at in self._changed_at.items()
+            if changed_at > expired_at
+        }
+        self._pruned_at = now
+
+    async def _refresh_if_stale(self) -> None:
+        if not self._is_stale():
+            return
+
+        async with self._lock:
+            # Another request may have refreshed while we were waiting for the lock
+            if not self._is_stale():
+                return
+            now = time.time()
+            since = (
+                None if self._fetched_at is None else self._fetched_at - SECURITY_CHANGES_OVERLAP
+            )
+            async with async_cache_connection.session() as cache_connection:
+                changes = await user_service.get_security_changes(
+                    cache_connection=cache_connection, since=since
+                )
+            for email, changed_at in changes.items():
+                if changed_at > self._changed_at.get(email, 0.0):
+                    self._changed_at[email] = changed_at
+            self._prune(now)
+            self._fetched_at = now
+            self._checked_at = time.monotonic()
+
+    async def is_revoked(self, email: str, issued_at: float) -> bool:
+        await self._refresh_if_stale()
+        changed_at = self._changed_at.get(email)
+        return changed_at is not None and issued_at < changed_at
+
+
+token_revocation_list = TokenRevocationList()
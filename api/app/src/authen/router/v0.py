@@ -14,7 +14,7 @@ from app.schemas import (
     Msg,
 )
 from app.src.dependencies import get_async_cache, get_db
-from app.src.users.db_models import User
+from app.src.users.principal import UserPrincipal
 
 from .. import schemas
 from ..dependencies import (
@@ -207,6 +207,6 @@ async def reset_password(
 
 @router.get("/auth-static")
 async def auth_static(
-    current_user: Annotated[User, Depends(get_current_media_user)],
+    current_user: Annotated[UserPrincipal | None, Depends(get_current_media_user)],
 ) -> Any:  # NOSONAR
     pass  # method for media authentication
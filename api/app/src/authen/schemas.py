@@ -13,6 +13,10 @@ class Token(BaseModel):
 
 class TokenPayload(BaseModel):
     sub: str
+    # Claims of stateless access tokens, see TOKEN.STATELESS_ACCESS_TOKEN
+    uid: OptionalField[int] = None
+    active: OptionalField[bool] = None
+    iat: OptionalField[float] = None
 
 
 class OIDCUser(BaseModel):
@@ -1,3 +1,4 @@
+import time
 from datetime import datetime, timedelta, timezone
 
 from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
@@ -16,11 +17,13 @@ from app.core.settings import settings
 from app.src.service import ServiceBase
 from app.src.users import errors as users_errors
 from app.src.users.db_models import User
+from app.src.users.principal import UserPrincipal
 from app.src.users.services import user_service, UserService
 
 from . import errors as authen_errors
 from . import schemas
 from .cache_repository import authen_cache_repository, AuthenCacheRepository
+from .revocation import token_revocation_list
 
 
 class AuthenService(ServiceBase):
@@ -55,9 +58,8 @@ class AuthenService(ServiceBase):
         if not email:
             raise authen_errors.invalid_reset_password_token(msg="Invalid reset password token")
 
-        user = await self.user_service.get_by_email(
-            db, cache_connection=cache_connection, email=email
-        )
+        # Load the row itself, a cached user is detached and can't be updated
+        user = await self.user_service.get_by_email(db, cache_connection=None, email=email)
         if not user:
             raise users_errors.user_not_found()
         if not user.is_active:
@@ -96,6 +98,11 @@ class AuthenService(ServiceBase):
             user.email,
             secret_key=settings.TOKEN.ACCESS_TOKEN_SECRET_KEY,
             expire=access_token_expire,
+            claims=(
+                {"uid": user.id, "active": user.is_active, "iat": time.time()}
+                if settings.TOKEN.STATELESS_ACCESS_TOKEN
+                else None
+            ),
         )
         refresh_token = create_token(
             user.email,
@@ -142,15 +149,34 @@ class AuthenService(ServiceBase):
 
     async def get_user_from_token(
         self, db: AsyncSession, cache_connection: Redis, token: str
-    ) -> User | None:
+    ) -> UserPrincipal | None:
+        """Authenticate an access token by looking its user up, through the user cache."""
         token_data = self.parse_token(
             token=token, secret_key=settings.TOKEN.ACCESS_TOKEN_SECRET_KEY
         )
 
-        return await self.user_service.get_by_email(
+        return await self.user_service.get_principal_by_email(
             db, cache_connection=cache_connection, email=str(token_data.sub)
         )
 
+    async def get_principal_from_token(self, token: str) -> UserPrincipal | None:
+        """Authenticate a stateless access token from its claims, without a user lookup.
+
+        Return None for tokens issued without the claims, which need the regular lookup.
+        """
+        token_data = self.parse_token(
+            token=token, secret_key=settings.TOKEN.ACCESS_TOKEN_SECRET_KEY
+        )
+        if token_data.uid is None or token_data.active is None or token_data.iat is None:
+            return None
+
+        if await token_revocation_list.is_revoked(
+            email=token_data.sub, issued_at=token_data.iat
+        ):
+            raise authen_errors.invalid_jwt_token("token is revoked")
+
+        return UserPrincipal(id=token_data.uid, email=token_data.sub, is_active=token_data.active)
+
     async def exchange_oidc_token(
         self,
         cache_connection: Redis,
@@ -233,6 +259,7 @@ class AuthenService(ServiceBase):
             connection=cache_connection,
             obj_email=email,
         )
+        await self.user_service.add_security_change(cache_connection=cache_connection, email=email)
 
     async def logout_all_with_token(self, cache_connection: Redis, refresh_token: str) -> None:
         token_data = self.parse_token(
@@ -243,6 +270,9 @@ class AuthenService(ServiceBase):
             connection=cache_connection,
             obj_email=token_data.sub,
         )
+        await self.user_service.add_security_change(
+            cache_connection=cache_connection, email=token_data.sub
+        )
 
 
 authen_service = AuthenService(
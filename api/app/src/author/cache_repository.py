@@ -1,59 +1,67 @@
-import json
-from typing import Sequence
-
 from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
 
 from app.core.settings import settings
 from app.src.cache_repository import BaseCacheRepository
 
-from .db_models import CasbinRule
-from .schemas import CasbinRuleInDB
-
 
 class CasbinRuleCacheRepository(BaseCacheRepository):
     ## Common
     @staticmethod
     def _generate_redis_casbin_rule() -> str:  # pylint: disable=redefined-builtin
-        return "Cache:CasbinRule:all"
+        return "Cache:CasbinRule:lines"
+
+    @staticmethod
+    def _generate_redis_casbin_rule_version() -> str:
+        return "Cache:CasbinRule:version"
 
-    async def create_cache_all(
-        self, connection: Redis, obj_casbin_rules: Sequence[CasbinRule]
-    ) -> None:
-        casbin_rules_in_db = [
-            CasbinRuleInDB.model_validate(obj_casbin_rule) for obj_casbin_rule in obj_casbin_rules
-        ]
+    @staticmethod
+    def _generate_redis_casbin_rule_channel() -> str:
+        return "Channel:CasbinRule:version"
 
+    async def create_cache_all(self, connection: Redis, lines: list[str]) -> None:
         await self.create(
             connection=connection,
             key=self._generate_redis_casbin_rule(),
-            value=json.dumps(
-                [
-                    casbin_rule_in_db.model_dump(mode="json")
-                    for casbin_rule_in_db in casbin_rules_in_db
-                ]
-            ),
+            value="\n".join(lines),
             ttl=settings.REDIS_CACHE.CASBIN_TTL,
         )
 
-    async def get_cache_all(self, connection: Redis) -> list[CasbinRule] | None:
-        db_objs = await self.get(
+    async def get_cache_all(self, connection: Redis) -> list[str] | None:
+        value = await self.get_and_touch(
             connection=connection,
             key=self._generate_redis_casbin_rule(),
             ttl=settings.REDIS_CACHE.CASBIN_TTL,
         )
-        if not db_objs:
+        if not value:
             return None
 
-        db_objs = json.loads(db_objs.decode())
-
-        casbin_rules_in_db = [CasbinRuleInDB.model_validate(db_obj) for db_obj in db_objs]
-
-        return [
-            CasbinRule(**casbin_rule_in_db.model_dump()) for casbin_rule_in_db in casbin_rules_in_db
-        ]
+        return value.decode().split("\n")
 
     async def delete_cache_all(self, connection: Redis) -> None:
         await self.delete(connection=connection, key=self._generate_redis_casbin_rule())
 
+    ## Version
+    async def get_cache_version(self, connection: Redis) -> int:
+        version = await self.get(
+            connection=connection, key=self._generate_redis_casbin_rule_version()
+        )
+        return int(version) if version is not None else 0
+
+    async def incr_cache_version(self, connection: Redis) -> int:
+        return await self.incr(
+            connection=connection, key=self._generate_redis_casbin_rule_version()
+        )
+
+    async def publish_cache_version(self, connection: Redis, version: int) -> None:
+        await self.publish(
+            connection=connection,
+            channel=self._generate_redis_casbin_rule_channel(),
+            message=version,
+        )
+
+    async def subscribe_cache_version(self, pubsub: PubSub) -> None:
+        await self.subscribe(pubsub=pubsub, channel=self._generate_redis_casbin_rule_channel())
+
 
 casbin_rule_cache_repository = CasbinRuleCacheRepository(repository_name="casbin_rule")
@@ -4,6 +4,7 @@ from casbin.persist.adapters.asyncio import AsyncAdapter
 
 from app.core.cache.cache_connections import async_cache_connection
 from app.core.db.db_connections import async_db_connection
+from app.core.metrics import metrics
 
 from . import schemas
 from .services import casbin_rule_service
@@ -33,23 +34,31 @@ class SqlAlchemyAdapter(AsyncAdapter):
         """
         return self._filtered
 
+    @metrics.timed("casbin_adapter_seconds", op="load_policy")
     async def load_policy(self, model: Model) -> None:
-        """loads all policy rules from the storage."""
-        async with async_db_connection.session() as db:
-            async with async_cache_connection.session() as cache_connection:
-                casbin_rules = await casbin_rule_service.get_all(
-                    db=db, cache_connection=cache_connection
-                )
+        """loads all policy rules from the storage.
+        A filtered adapter skips the user -> role rules, they are resolved per subject.
+        Loads follow policy writes, they read from a replica only once it replayed them.
+        """
+        async with async_db_connection.replica_session(consistent=True) as db:
+            if self._filtered:
+                lines = await casbin_rule_service.get_role_lines(db=db)
+            else:
+                async with async_cache_connection.session() as cache_connection:
+                    lines = await casbin_rule_service.get_all_lines(
+                        db=db, cache_connection=cache_connection
+                    )
 
-        if casbin_rules is None:
+        if lines is None:
             return
 
-        for casbin_rule in casbin_rules:
-            persist.load_policy_line(str(casbin_rule), model)
+        for line in lines:
+            persist.load_policy_line(line, model)
 
+    @metrics.timed("casbin_adapter_seconds", op="load_filtered_policy")
     async def load_filtered_policy(self, model: Model, filter: SqlAlchemyFilter) -> None:
         """loads all policy rules from the storage"""
-        async with async_db_connection.session() as db:
+        async with async_db_connection.replica_session(consistent=True) as db:
             casbin_rules = await casbin_rule_service.get_all_by_list_attribute(
                 db=db,
                 ptype=filter.ptype,
@@ -65,6 +74,7 @@ class SqlAlchemyAdapter(AsyncAdapter):
                 persist.load_policy_line(str(casbin_rule), model)
             self._filtered = True
 
+    @metrics.timed("casbin_adapter_seconds", op="save_policy")
     async def save_policy(self, model: Model) -> bool:
         """saves all policy rules to the storage."""
         objs_in = []
@@ -90,6 +100,7 @@ class SqlAlchemyAdapter(AsyncAdapter):
 
         return True
 
+    @metrics.timed("casbin_adapter_seconds", op="add_policy")
     async def add_policy(self, sec: str, ptype: str, rule: list[str]) -> None:
         """adds a policy rule to the storage."""
         async with async_db_connection.session() as db:
@@ -103,6 +114,7 @@ class SqlAlchemyAdapter(AsyncAdapter):
                     ),
                 )
 
+    @metrics.timed("casbin_adapter_seconds", op="add_policies")
     async def add_policies(self, sec: str, ptype: str, rules: list[list[str]]) -> None:
         """AddPolicies adds policy rules to the storage."""
         async with async_db_connection.session() as db:
@@ -119,6 +131,7 @@ class SqlAlchemyAdapter(AsyncAdapter):
                     ],
                 )
 
+    @metrics.timed("casbin_adapter_seconds", op="remove_policy")
     async def remove_policy(self, sec: str, ptype: str, rule: list[str]) -> bool:
         """removes a policy rule from the storage."""
         async with async_db_connection.session() as db:
@@ -130,14 +143,22 @@ class SqlAlchemyAdapter(AsyncAdapter):
                     **{f"v{id}": value for id, value in enumerate(rule)},
                 )
 
+    @metrics.timed("casbin_adapter_seconds", op="remove_policies")
     async def remove_policies(self, sec: str, ptype: str, rules: list[list[str]]) -> None:
         """RemovePolicies removes policy rules from the storage."""
         if not rules:
             return
 
-        for rule in rules:
-            await self.remove_policy(sec, ptype, rule)
+        async with async_db_connection.session() as db:
+            async with async_cache_connection.session() as cache_connection:
+                await casbin_rule_service.delete_by_rules(
+                    db=db,
+                    cache_connection=cache_connection,
+                    ptype=ptype,
+                    rules=rules,
+                )
 
+    @metrics.timed("casbin_adapter_seconds", op="remove_filtered_policy")
     async def remove_filtered_policy(  # type: ignore
         self, sec: str, ptype: str, field_index: int, *field_values
     ) -> bool:
@@ -163,6 +184,7 @@ class SqlAlchemyAdapter(AsyncAdapter):
                     },
                 )
 
+    @metrics.timed("casbin_adapter_seconds", op="update_policy")
     async def update_policy(
         self, sec: str, ptype: str, old_rule: list[str], new_rule: list[str]
     ) -> None:
@@ -195,6 +217,7 @@ class SqlAlchemyAdapter(AsyncAdapter):
                     ),
                 )
 
+    @metrics.timed("casbin_adapter_seconds", op="update_policies")
     async def update_policies(
         self,
         sec: str,
@@ -205,9 +228,23 @@ class SqlAlchemyAdapter(AsyncAdapter):
         """
         UpdatePolicies updates some policy rules to storage, like db, redis.
         """
-        for old_rule, new_rule in zip(old_rules, new_rules, strict=True):
-            await self.update_policy(sec, ptype, old_rule, new_rule)
+        if len(old_rules) != len(new_rules):
+            raise ValueError("old_rules and new_rules must have the same length")
+
+        if not old_rules:
+            return
+
+        async with async_db_connection.session() as db:
+            async with async_cache_connection.session() as cache_connection:
+                await casbin_rule_service.update_by_rules(
+                    db=db,
+                    cache_connection=cache_connection,
+                    ptype=ptype,
+                    old_rules=old_rules,
+                    new_rules=new_rules,
+                )
 
+    @metrics.timed("casbin_adapter_seconds", op="update_filtered_policies")
     async def update_filtered_policies(  # type: ignore
         self, sec, ptype, new_rules: list[list[str]], field_index, *field_values
     ) -> None:
@@ -1,13 +1,255 @@
+import asyncio
+import time
+from collections import OrderedDict
+
 import casbin
 
+from app.core.cache.cache_connections import async_cache_connection
+from app.core.db.db_connections import async_db_connection
+from app.core.metrics import metrics
 from app.core.settings import settings
 
 from .casbin_adapter import SqlAlchemyAdapter
+from .compiled_authorizer import CompiledAuthorizer
+from .services import casbin_rule_service
+
+__all__ = ["CasbinEnforcer", "init_casbin_enforcer"]
+
+
+class CasbinEnforcer(casbin.AsyncEnforcer):
+    """AsyncEnforcer holding a versioned in-process snapshot of the policy.
+
+    Every `CasbinRuleService` mutation bumps a Redis policy version counter, so a request
+    only has to compare that counter against `policy_version` and reload when it moved.
+    While a `CasbinPolicyListener` is subscribed, version bumps are pushed to the enforcer
+    and requests only poll Redis every `CASBIN.POLICY_VERSION_CHECK_INTERVAL` seconds.
+
+    Enforcement results are memoized in a bounded LRU that lives as long as the snapshot:
+    it is dropped on every reload and on every local policy mutation. With
+    `CASBIN.COMPILED_AUTHORIZER` enabled, cache misses are answered by a `CompiledAuthorizer`
+    built from the snapshot instead of the generic casbin matcher.
+
+    With a filtered adapter (`CASBIN.FILTERED_POLICY`) the snapshot holds no user -> role
+    rules; `enforce_subject` resolves the subject's roles from the DB instead and caches
+    them for `CASBIN.SUBJECT_ROLES_TTL` seconds.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:  # type: ignore
+        super().__init__(*args, **kwargs)
+        self.policy_version: int | None = None
+        self.listener_active = False
+        self._version_checked_at = 0.0
+        self._reload_lock = asyncio.Lock()
+        self._decisions: OrderedDict[tuple[str, ...], bool] = OrderedDict()
+        self._authorizer: CompiledAuthorizer | None = None
+        # Whether the snapshot was mutated locally since it was loaded or saved
+        self.policy_modified = False
+        self._subject_roles: OrderedDict[str, tuple[float, list[str]]] = OrderedDict()
+
+    async def _get_remote_version(self) -> int:
+        with metrics.timer("casbin_version_check_seconds"):
+            async with async_cache_connection.session() as cache_connection:
+                version = await casbin_rule_service.get_version(cache_connection=cache_connection)
+        self._version_checked_at = time.monotonic()
+        return version
+
+    async def load_policy(self) -> None:
+        # Read the version before loading: a mutation racing the load then leaves the
+        # snapshot tagged with an older version and the next check reloads again.
+        await self._load_policy_version(await self._get_remote_version())
+
+    async def _load_policy_version(self, version: int) -> None:
+        with metrics.timer("casbin_policy_reload_seconds"):
+            await super().load_policy()
+        self.policy_version = version
+        self.policy_modified = False
+        self._invalidate_snapshot()
+
+    async def save_policy(self) -> None:
+        await super().save_policy()
+        self.policy_modified = False
+
+    async def save_policy_if_current(self) -> bool:
+        """Save the snapshot unless the policy version moved since it was loaded.
+
+        Saving rewrites the stored rules to match the snapshot, a stale one would undo the
+        changes of other workers. Hold the `api-casbin-save-policy` lock while calling it.
+        """
+        if await self._get_remote_version() != self.policy_version:
+            return False
+        await self.save_policy()
+        return True
+
+    def _invalidate_snapshot(self) -> None:
+        self._decisions.clear()
+        self._authorizer = None
+        self._subject_roles.clear()
+
+    def _on_local_mutation(self) -> None:
+        self.policy_modified = True
+        self._invalidate_snapshot()
+
+    def _enforce_compiled(self, *rvals: str) -> bool:
+        with metrics.timer("casbin_enforce_seconds"):
+            if not settings.CASBIN.COMPILED_AUTHORIZER:
+                return self.enforce(*rvals)
+
+            if self._authorizer is None:
+                self._authorizer = CompiledAuthorizer(
+                    policies=self.get_policy(), groupings=self.get_grouping_policy()
+                )
+
+            decision = self._authorizer.enforce(*rvals)
+            return self.enforce(*rvals) if decision is None else decision
+
+    async def load_policy_if_stale(
+        self, version: int | None = None, check_remote: bool = False
+    ) -> bool:
+        """Reload the policy only if the policy version changed since the last load.
+
+        `version` is the version announced by the listener; when omitted it is read from Redis,
+        unless the listener is active and the last check is recent enough. `check_remote`
+        always reads it, for writes that must not act on a snapshot the listener hasn't caught
+        up with yet.
+        """
+        if version is None:
+            if (
+                not check_remote
+                and self.listener_active
+                and time.monotonic() - self._version_checked_at
+                < settings.CASBIN.POLICY_VERSION_CHECK_INTERVAL
+            ):
+                return False
+            version = await self._get_remote_version()
+
+        if version == self.policy_version:
+            return False
+
+        async with self._reload_lock:
+            # Another request may have reloaded while we were waiting for the lock
+            if version == self.policy_version:
+                return False
+            await self._load_policy_version(version)
+
+        return True
+
+    def enforce_cached(self, *rvals: str) -> bool:
+        """`enforce` memoized per policy snapshot, keyed by the request values."""
+        if settings.CASBIN.DECISION_CACHE_SIZE <= 0:
+            return self._enforce_compiled(*rvals)
+
+        decision = self._decisions.get(rvals)
+        if decision is not None:
+            self._decisions.move_to_end(rvals)
+            metrics.inc("casbin_decision_cache_hits_total")
+            return decision
+
+        metrics.inc("casbin_decision_cache_misses_total")
+        decision = self._enforce_compiled(*rvals)
+        self._decisions[rvals] = decision
+        if len(self._decisions) > settings.CASBIN.DECISION_CACHE_SIZE:
+            self._decisions.popitem(last=False)
+        return decision
+
+    async def _get_subject_roles(self, sub: str) -> list[str]:
+        cached = self._subject_roles.get(sub)
+        if cached is not None and time.monotonic() < cached[0]:
+            self._subject_roles.move_to_end(sub)
+            return cached[1]
+
+        with metrics.timer("casbin_subject_roles_seconds"):
+            async with async_db_connection.session("readonly") as db:
+                roles = await casbin_rule_service.get_roles_for_subject(db=db, subject=sub)
+
+        self._subject_roles[sub] = (time.monotonic() + settings.CASBIN.SUBJECT_ROLES_TTL, roles)
+        self._subject_roles.move_to_end(sub)
+        if len(self._subject_roles) > settings.CASBIN.SUBJECT_ROLES_CACHE_SIZE:
+            self._subject_roles.popitem(last=False)
+        return roles
+
+    async def enforce_subject(self, sub: str, obj: str, act: str) -> bool:
+        """`enforce_cached` that also works when user -> role rules are not loaded.
+
+        `g` is transitive, so `sub` is allowed iff a rule grants `sub` itself or one of its
+        direct roles, whose own inheritance is part of the filtered snapshot.
+        """
+        if self.enforce_cached(sub, obj, act):
+            return True
+        if not self.is_filtered():
+            return False
+
+        return any(
+            self.enforce_cached(role, obj, act) for role in await self._get_subject_roles(sub)
+        )
+
+    ## Local mutations change the snapshot in place, drop everything derived from it
+
+    async def _add_policy(self, sec, ptype, rule):  # type: ignore
+        try:
+            return await super()._add_policy(sec, ptype, rule)
+        finally:
+            self._on_local_mutation()
+
+    async def _add_policies(self, sec, ptype, rules):  # type: ignore
+        try:
+            return await super()._add_policies(sec, ptype, rules)
+        finally:
+            self._on_local_mutation()
+
+    async def _update_policy(self, sec, ptype, old_rule, new_rule):  # type: ignore
+        try:
+            return await super()._update_policy(sec, ptype, old_rule, new_rule)
+        finally:
+            self._on_local_mutation()
+
+    async def _update_policies(self, sec, ptype, old_rules, new_rules):  # type: ignore
+        try:
+            return await super()._update_policies(sec, ptype, old_rules, new_rules)
+        finally:
+            self._on_local_mutation()
+
+    async def _update_filtered_policies(  # type: ignore
+        self, sec, ptype, new_rules, field_index, *field_values
+    ):
+        try:
+            return await super()._update_filtered_policies(
+                sec, ptype, new_rules, field_index, *field_values
+            )
+        finally:
+            self._on_local_mutation()
+
+    async def _remove_policy(self, sec, ptype, rule):  # type: ignore
+        try:
+            return await super()._remove_policy(sec, ptype, rule)
+        finally:
+            self._on_local_mutation()
+
+    async def _remove_policies(self, sec, ptype, rules):  # type: ignore
+        try:
+            return await super()._remove_policies(sec, ptype, rules)
+        finally:
+            self._on_local_mutation()
+
+    async def _remove_filtered_policy(self, sec, ptype, field_index, *field_values):  # type: ignore
+        try:
+            return await super()._remove_filtered_policy(sec, ptype, field_index, *field_values)
+        finally:
+            self._on_local_mutation()
+
+    async def _remove_filtered_policy_returns_effects(  # type: ignore
+        self, sec, ptype, field_index, *field_values
+    ):
+        try:
+            return await super()._remove_filtered_policy_returns_effects(
+                sec, ptype, field_index, *field_values
+            )
+        finally:
+            self._on_local_mutation()
 
 
-async def init_casbin_enforcer() -> casbin.Enforcer:
-    adapter = SqlAlchemyAdapter()
-    casbin_enforcer = casbin.AsyncEnforcer(settings.CASBIN.PATH_MODEL, adapter, enable_log=False)
+async def init_casbin_enforcer() -> CasbinEnforcer:
+    adapter = SqlAlchemyAdapter(filtered=settings.CASBIN.FILTERED_POLICY)
+    casbin_enforcer = CasbinEnforcer(settings.CASBIN.PATH_MODEL, adapter, enable_log=False)
     casbin_enforcer.enable_auto_save(True)
     await casbin_enforcer.load_policy()
 
@@ -0,0 +1,62 @@
+import asyncio
+import contextlib
+
+from loguru import logger
+
+from app.core.cache.cache_connections import async_cache_connection
+from app.core.settings import settings
+
+from .casbin_enforcer import CasbinEnforcer
+from .services import casbin_rule_service
+
+__all__ = ["CasbinPolicyListener"]
+
+
+class CasbinPolicyListener:
+    """Background task applying policy version bumps published by other workers."""
+
+    def __init__(self, enforcer: CasbinEnforcer) -> None:
+        self.enforcer = enforcer
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="casbin-policy-listener")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        self.enforcer.listener_active = False
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa: B902
+                logger.exception("casbin policy listener disconnected, reconnecting")
+
+            # Fall back to polling the version on requests until we are subscribed again
+            self.enforcer.listener_active = False
+            await asyncio.sleep(settings.CASBIN.POLICY_LISTENER_RETRY_INTERVAL)
+
+    async def _listen(self) -> None:
+        async with async_cache_connection.session() as cache_connection:
+            async with cache_connection.pubsub() as pubsub:
+                await casbin_rule_service.subscribe_version(pubsub=pubsub)
+
+                # Bumps published while we were not subscribed are lost, catch up first
+                self.enforcer.listener_active = False
+                await self.enforcer.load_policy_if_stale()
+                self.enforcer.listener_active = True
+
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    await self.enforcer.load_policy_if_stale(version=int(message["data"]))
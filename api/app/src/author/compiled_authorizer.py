@@ -0,0 +1,145 @@
+import re
+from collections import defaultdict
+from typing import Iterable
+
+__all__ = ["CompiledAuthorizer"]
+
+HTTP_METHODS = frozenset(
+    {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "TRACE", "CONNECT"}
+)
+
+_METHOD_TOKEN = re.compile(r"^\(?([A-Z]+)\)?$")
+_LITERAL_SEGMENT = re.compile(r"^[A-Za-z0-9_\-]*$")
+_PARAM_SEGMENT = re.compile(r"^\{[^{}/]+\}$")
+
+
+class _Node:
+    __slots__ = ("literals", "param", "grants", "wildcard_grants")
+
+    def __init__(self) -> None:
+        self.literals: dict[str, _Node] = {}
+        self.param: _Node | None = None
+        # method -> roles allowed by rules ending exactly at this node
+        self.grants: defaultdict[str, set[str]] = defaultdict(set)
+        # method -> roles allowed by `/*` rules ending at this node
+        self.wildcard_grants: defaultdict[str, set[str]] = defaultdict(set)
+
+
+def compile_methods(act: str) -> frozenset[str] | None:
+    """Expand a `(GET)|(POST)` style action into a set of methods, None if not compilable."""
+    methods = set()
+    for token in act.split("|"):
+        match = _METHOD_TOKEN.match(token)
+        if match is None or match.group(1) not in HTTP_METHODS:
+            return None
+        methods.add(match.group(1))
+    return frozenset(methods)
+
+
+def compile_path(obj: str) -> list[str] | None:
+    """Split a policy path into trie segments, None if not compilable.
+
+    Supported: literal segments, whole-segment `{param}` and a trailing `/*`, which is the
+    subset where `keyMatch || keyMatch3` reduces to plain segment matching.
+    """
+    if not obj.startswith("/"):
+        return None
+
+    segments = obj.split("/")[1:]
+    for index, segment in enumerate(segments):
+        if segment == "*" and index == len(segments) - 1:
+            continue
+        if _LITERAL_SEGMENT.match(segment) is None and _PARAM_SEGMENT.match(segment) is None:
+            return None
+    return segments
+
+
+class CompiledAuthorizer:
+    """Precompiled index of the RBAC policy for constant-time permission checks.
+
+    Mirrors the shipped `casbin_model.conf` matcher: role inheritance is flattened per
+    subject, `regexMatch` method alternations are expanded into sets and paths are indexed
+    in a segment trie. Rules it can't compile are left to casbin: `enforce` then returns None
+    when only such rules could still allow the request.
+    """
+
+    def __init__(
+        self,
+        policies: Iterable[list[str]],
+        groupings: Iterable[list[str]],
+        max_hierarchy_level: int = 10,
+    ) -> None:
+        self.max_hierarchy_level = max_hierarchy_level
+        self._root = _Node()
+        self._fallback_subjects: set[str] = set()
+        self._parents: defaultdict[str, set[str]] = defaultdict(set)
+        self._roles: dict[str, frozenset[str]] = {}
+
+        for grouping in groupings:
+            self._parents[grouping[0]].add(grouping[1])
+
+        for policy in policies:
+            self._add_policy(*policy[:3])
+
+    def _add_policy(self, sub: str, obj: str, act: str) -> None:
+        methods = compile_methods(act)
+        segments = compile_path(obj)
+        if methods is None or segments is None:
+            self._fallback_subjects.add(sub)
+            return
+
+        node = self._root
+        wildcard = segments[-1] == "*"
+        for segment in segments[:-1] if wildcard else segments:
+            if _PARAM_SEGMENT.match(segment):
+                node.param = node.param or _Node()
+                node = node.param
+            else:
+                node = node.literals.setdefault(segment, _Node())
+
+        grants = node.wildcard_grants if wildcard else node.grants
+        for method in methods:
+            grants[method].add(sub)
+
+    def get_roles(self, sub: str) -> frozenset[str]:
+        """Return `sub` and every role it inherits, like casbin's default role manager."""
+        roles = self._roles.get(sub)
+        if roles is not None:
+            return roles
+
+        found = {sub}
+        frontier = {sub}
+        for _ in range(self.max_hierarchy_level):
+            frontier = {
+                parent for name in frontier for parent in self._parents.get(name, ())
+            } - found
+            if not frontier:
+                break
+            found |= frontier
+
+        roles = self._roles[sub] = frozenset(found)
+        return roles
+
+    def enforce(self, sub: str, obj: str, act: str) -> bool | None:
+        roles = self.get_roles(sub)
+        if self._match(self._root, obj.split("/")[1:], 0, roles, act):
+            return True
+        if not self._fallback_subjects.isdisjoint(roles):
+            return None
+        return False
+
+    def _match(
+        self, node: _Node, segments: list[str], index: int, roles: frozenset[str], act: str
+    ) -> bool:
+        if index < len(segments) and not roles.isdisjoint(node.wildcard_grants.get(act, ())):
+            return True
+        if index == len(segments):
+            return not roles.isdisjoint(node.grants.get(act, ()))
+
+        segment = segments[index]
+        child = node.literals.get(segment)
+        if child is not None and self._match(child, segments, index + 1, roles, act):
+            return True
+        if node.param is not None and segment != "":
+            return self._match(node.param, segments, index + 1, roles, act)
+        return False
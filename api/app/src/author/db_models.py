@@ -20,11 +20,12 @@ class CasbinRule(TimestampMixin, Base):
     v5: Mapped[str | None] = mapped_column(String(255))
 
     def __str__(self) -> str:
-        return ", ".join(
-            v
-            for v in (self.ptype, self.v0, self.v1, self.v2, self.v3, self.v4, self.v5)
-            if v is not None
-        )
+        return self.to_policy_line(self.ptype, self.v0, self.v1, self.v2, self.v3, self.v4, self.v5)
+
+    @staticmethod
+    def to_policy_line(*values: str | None) -> str:
+        """Render `ptype, v0, .., v5` as a casbin policy line."""
+        return ", ".join(v for v in values if v is not None)
 
     def __repr__(self) -> str:
         return '<CasbinRule {}: "{}">'.format(self.id, str(self))
@@ -33,6 +34,8 @@ class CasbinRule(TimestampMixin, Base):
     def __table_args__(cls) -> Any:
         return (
             Index("ix_casbin_rule_all", "ptype", "v0", "v1", "v2", "v3", "v4", "v5"),
+            # Role -> members lookups, `ix_casbin_rule_all` covers member -> roles
+            Index("ix_casbin_rule_role", "ptype", "v1", "v0"),
             UniqueConstraint(
                 "ptype",
                 "v0",
@@ -1,8 +1,10 @@
-from typing import Sequence
+from collections import defaultdict
+from typing import Any, Sequence
 
-from sqlalchemy import delete
+from sqlalchemy import and_, ColumnElement, delete, insert, or_, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.sql import Select
 
 from app.src.db_repository import BaseDbRepository
 
@@ -10,6 +12,42 @@ from .db_models import CasbinRule
 
 
 class CasbinRuleDbRepository(BaseDbRepository[CasbinRule]):
+    ### Common
+    def _match_rules(self, rules: list[list[str]]) -> ColumnElement[bool]:
+        """Rows equal to one of `rules`: `(v0, .., vN) IN (...)` and the other columns NULL.
+
+        One tuple IN per rule length, a rule never matches a longer one it is a prefix of.
+        """
+        columns = [
+            self.model.v0,
+            self.model.v1,
+            self.model.v2,
+            self.model.v3,
+            self.model.v4,
+            self.model.v5,
+        ]
+        rules_by_length: defaultdict[int, list[tuple[str, ...]]] = defaultdict(list)
+        for rule in rules:
+            rules_by_length[len(rule)].append(tuple(rule))
+        return or_(
+            *(
+                and_(
+                    tuple_(*columns[:length]).in_(values),
+                    *(column.is_(None) for column in columns[length:]),
+                )
+                for length, values in rules_by_length.items()
+            )
+        )
+
+    ### Create
+    async def bulk_create(
+        self, db: AsyncSession, *, values: list[dict[str, Any]], commit: bool = True
+    ) -> None:
+        if values:
+            await db.execute(insert(self.model), values)
+        if commit:
+            await db.commit()
+
     ### Get
     async def get_by_attribute(
         self,
@@ -36,6 +74,57 @@ class CasbinRuleDbRepository(BaseDbRepository[CasbinRule]):
         q = await db.execute(query)
         return q.scalars().one_or_none()
 
+    def _select_lines(self) -> Select:
+        return select(
+            self.model.ptype,
+            self.model.v0,
+            self.model.v1,
+            self.model.v2,
+            self.model.v3,
+            self.model.v4,
+            self.model.v5,
+        ).order_by(self.model.id)
+
+    async def get_all_lines(self, db: AsyncSession) -> list[str]:
+        q = await db.execute(self._select_lines())
+        return [self.model.to_policy_line(*row) for row in q.all()]
+
+    async def get_role_lines(self, db: AsyncSession) -> list[str]:
+        """Lines of every non-`g` rule and of the `g` rules whose subject is itself a role.
+
+        A subject is a role when some `g` rule inherits from it, so user -> role rows are
+        left out while every role reachable from a user keeps its inheritance.
+        """
+        roles = select(self.model.v1).where(self.model.ptype == "g")
+        query = self._select_lines().where(
+            or_(self.model.ptype != "g", self.model.v0.in_(roles))
+        )
+        q = await db.execute(query)
+        return [self.model.to_policy_line(*row) for row in q.all()]
+
+    async def get_roles_for_subject(self, db: AsyncSession, *, subject: str) -> list[str]:
+        query = select(self.model.v1).where(self.model.ptype == "g").where(self.model.v0 == subject)
+        q = await db.execute(query)
+        return [role for role in q.scalars().all() if role is not None]
+
+    def _select_subjects_for_role(self, role: str) -> Select:
+        # Served by `ix_casbin_rule_role`, ordered by the same index
+        return (
+            select(self.model.v0)
+            .where(self.model.ptype == "g")
+            .where(self.model.v1 == role)
+            .order_by(self.model.v0)
+        )
+
+    async def get_subjects_for_role_count(
+        self, db: AsyncSession, *, role: str, offset: int = 0, limit: int = 100
+    ) -> tuple[list[str], int]:
+        query = self._select_subjects_for_role(role)
+        q = await db.execute(query.offset(offset).limit(limit))
+        subjects = [subject for subject in q.scalars().all() if subject is not None]
+        total = await self.count(db=db, query=query)
+        return subjects, total
+
     async def get_all_by_list_attribute(
         self,
         db: AsyncSession,
@@ -102,8 +191,68 @@ class CasbinRuleDbRepository(BaseDbRepository[CasbinRule]):
         await db.commit()
         return True if result.rowcount > 0 else False
 
+    async def delete_by_rules(
+        self,
+        db: AsyncSession,
+        *,
+        ptype: str,
+        rules: list[list[str]],
+        commit: bool = True,
+    ) -> int:
+        result = await db.execute(
+            delete(self.model)
+            .where(self.model.ptype == ptype)
+            .where(self._match_rules(rules))
+        )
+        if commit:
+            await db.commit()
+        return result.rowcount
+
     ### Update
 
+    async def update_by_rules(
+        self,
+        db: AsyncSession,
+        *,
+        ptype: str,
+        old_rules: list[list[str]],
+        new_rules: list[list[str]],
+    ) -> int:
+        """Replace every stored `old_rules[i]` by `new_rules[i]`, rules not stored are skipped.
+
+        Return the number of rules replaced.
+        """
+        result = await db.execute(
+            delete(self.model)
+            .where(self.model.ptype == ptype)
+            .where(self._match_rules(old_rules))
+            .returning(
+                self.model.v0,
+                self.model.v1,
+                self.model.v2,
+                self.model.v3,
+                self.model.v4,
+                self.model.v5,
+            )
+        )
+        # Rules are stored from v0 on, the unused columns are NULL
+        deleted = {tuple(value for value in row if value is not None) for row in result.all()}
+        replacements = [
+            new_rule
+            for old_rule, new_rule in zip(old_rules, new_rules, strict=True)
+            if tuple(old_rule) in deleted
+        ]
+        await self.bulk_create(
+            db=db,
+            values=[
+                {"ptype": ptype, **{f"v{id}": value for id, value in enumerate(rule)}}
+                for rule in replacements
+            ],
+            commit=False,
+        )
+        await db.commit()
+        return len(replacements)
+
     async def update_by_attribute(  # noqa: C901
         self,
         db: AsyncSession,
@@ -138,13 +287,37 @@ class CasbinRuleDbRepository(BaseDbRepository[CasbinRule]):
             db.add(db_obj)
         await db.commit()
 
-    ### Save = delete all + all
-    async def save(self, db: AsyncSession, *, db_objs: list[CasbinRule]) -> None:
-        await db.execute(delete(self.model))
-        await db.flush()
-        for db_obj in db_objs:
-            db.add(db_obj)
+    ### Save = diff against the stored rules, delete removed + add missing
+    async def save(self, db: AsyncSession, *, values: list[dict[str, Any]]) -> bool:
+        columns = ("ptype", "v0", "v1", "v2", "v3", "v4", "v5")
+        wanted = {tuple(value.get(column) for column in columns) for value in values}
+
+        q = await db.execute(
+            select(
+                self.model.id,
+                self.model.ptype,
+                self.model.v0,
+                self.model.v1,
+                self.model.v2,
+                self.model.v3,
+                self.model.v4,
+                self.model.v5,
+            )
+        )
+        stored: dict[tuple[str | None, ...], int] = {tuple(row[1:]): row[0] for row in q.all()}
+
+        delete_ids = [rule_id for rule, rule_id in stored.items() if rule not in wanted]
+        insert_values = [
+            dict(zip(columns, rule, strict=True)) for rule in wanted if rule not in stored
+        ]
+        if not delete_ids and not insert_values:
+            return False
+
+        if delete_ids:
+            await db.execute(delete(self.model).where(self.model.id.in_(delete_ids)))
+        await self.bulk_create(db=db, values=insert_values, commit=False)
         await db.commit()
+        return True
 
 
 casbin_rule_db_repository = CasbinRuleDbRepository(model=CasbinRule)
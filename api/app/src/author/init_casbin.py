@@ -1,21 +1,20 @@
 import casbin
 
+from app.core.db.db_connections import async_db_connection
 from app.core.settings import settings
+from app.src.author.casbin_enforcer import CasbinEnforcer
 from app.src.author.services import casbin_service
 
 __all__ = ["init_casbin"]
 
 
-async def init_casbin(casbin_enforcer: casbin.Enforcer) -> None:
+async def init_casbin(casbin_enforcer: CasbinEnforcer) -> None:
     file_enforcer = casbin.AsyncEnforcer(settings.CASBIN.PATH_MODEL, settings.CASBIN.PATH_POLICY)
     await file_enforcer.load_policy()
 
-    for policy in await casbin_service.get_policy_list(enforcer=file_enforcer):
-        if not await casbin_service.has_policy(enforcer=casbin_enforcer, p=policy):
-            await casbin_service.create_policy(enforcer=casbin_enforcer, p=policy)
+    async with async_db_connection.session() as db:
+        await casbin_service.seed_policy(db=db, enforcer=casbin_enforcer, source=file_enforcer)
 
-    for group in await casbin_service.get_group_list(enforcer=file_enforcer):
-        if not await casbin_service.has_grouping(enforcer=casbin_enforcer, g=group):
-            await casbin_service.create_group(enforcer=casbin_enforcer, g=group)
-
-    await casbin_enforcer.save_policy()
+    # Rules are auto-saved as they are added, a filtered snapshot can't be saved as a whole
+    if not casbin_enforcer.is_filtered():
+        await casbin_enforcer.save_policy()
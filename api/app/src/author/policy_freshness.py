@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .casbin_enforcer import CasbinEnforcer
+
+__all__ = ["ensure_fresh_policy"]
+
+
+async def ensure_fresh_policy(enforcer: CasbinEnforcer, check_remote: bool = False) -> None:
+    """Bring the enforcer's in-memory policy up to date before it is read or mutated.
+
+    The enforcer reloads only when the policy version moved, so after the request's
+    authorization dependency this is normally a no-op and reads are served from memory.
+    """
+    await enforcer.load_policy_if_stale(check_remote=check_remote)
@@ -1,30 +1,41 @@
 from typing import Annotated, Any
 
-import casbin
 from fastapi import Body, Depends
+from fastapi_pagination.api import create_page, resolve_params
+from fastapi_pagination.default import Page, Params
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.http.api_router import APIRouter
 from app.src.authen.dependencies import get_current_active_authorized
-from app.src.dependencies import get_casbin_enforcer, get_db
-from app.src.users.db_models import User
+from app.src.dependencies import (
+    get_async_cache,
+    get_casbin_enforcer,
+    get_db,
+    get_db_readonly,
+)
+from app.src.users.principal import UserPrincipal
+from app.utils import get_limit_offset, get_params
 
 from .. import schemas
+from ..casbin_enforcer import CasbinEnforcer
 from ..services import casbin_service
 
 router = APIRouter()
 
 
 Db = Annotated[AsyncSession, Depends(get_db)]
-CurrentUser = Annotated[User, Depends(get_current_active_authorized)]
-CasbinEnforcer = Annotated[casbin.AsyncEnforcer, Depends(get_casbin_enforcer)]
+ReadonlyDb = Annotated[AsyncSession, Depends(get_db_readonly)]
+CacheConnection = Annotated[Redis, Depends(get_async_cache)]
+CurrentUser = Annotated[UserPrincipal, Depends(get_current_active_authorized)]
+Enforcer = Annotated[CasbinEnforcer, Depends(get_casbin_enforcer)]
 
 
 @router.get("/policy")
 async def get_all_policies(
     *,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
 ) -> Any:
     return await casbin_service.get_policy_list(enforcer=casbin_enforcer)
 
@@ -33,7 +44,7 @@ async def get_all_policies(
 async def get_role_policies(
     *,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     role: str,
 ) -> Any:
     return await casbin_service.get_policy_list_by_role(enforcer=casbin_enforcer, role=role)
@@ -43,7 +54,7 @@ async def get_role_policies(
 async def create_policy(
     *,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     p: schemas.Policy,
 ) -> Any:
     return await casbin_service.create_policy(enforcer=casbin_enforcer, p=p)
@@ -53,7 +64,7 @@ async def create_policy(
 async def create_policies(
     *,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     ps: list[schemas.Policy],
 ) -> Any:
     return await casbin_service.create_policies(enforcer=casbin_enforcer, ps=ps)
@@ -63,7 +74,7 @@ async def create_policies(
 async def update_policy(
     *,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     old: schemas.Policy,
     new: schemas.Policy,
 ) -> Any:
@@ -74,7 +85,7 @@ async def update_policy(
 async def update_policies(
     *,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     old: list[schemas.Policy],
     new: list[schemas.Policy],
 ) -> Any:
@@ -85,7 +96,7 @@ async def update_policies(
 async def delete_policy(
     *,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     p: schemas.Policy,
 ) -> Any:
     return await casbin_service.delete_policy(enforcer=casbin_enforcer, p=p)
@@ -95,7 +106,7 @@ async def delete_policy(
 async def delete_policies(
     *,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     ps: list[schemas.Policy],
 ) -> Any:
     return await casbin_service.delete_policies(enforcer=casbin_enforcer, ps=ps)
@@ -104,37 +115,40 @@ async def delete_policies(
 @router.get("/group")
 async def get_all_groups(
     *,
+    db: ReadonlyDb,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
 ) -> Any:
-    return await casbin_service.get_group_list(enforcer=casbin_enforcer)
+    return await casbin_service.get_group_list(db=db, enforcer=casbin_enforcer)
 
 
 @router.post("/group")
 async def create_group(
     *,
+    db: Db,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     g: schemas.Group,
 ) -> Any:
-    return await casbin_service.create_group(enforcer=casbin_enforcer, g=g)
+    return await casbin_service.create_group(db=db, enforcer=casbin_enforcer, g=g)
 
 
 @router.post("/groups")
 async def create_groups(
     *,
+    db: Db,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     gs: list[schemas.Group],
 ) -> Any:
-    return await casbin_service.create_groups(enforcer=casbin_enforcer, gs=gs)
+    return await casbin_service.create_groups(db=db, enforcer=casbin_enforcer, gs=gs)
 
 
 @router.delete("/group")
 async def delete_group(
     *,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     g: schemas.Group,
 ) -> Any:
     return await casbin_service.delete_group(enforcer=casbin_enforcer, g=g)
@@ -144,7 +158,7 @@ async def delete_group(
 async def delete_groups(
     *,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     gs: list[schemas.Group],
 ) -> Any:
     return await casbin_service.delete_groups(enforcer=casbin_enforcer, gs=gs)
@@ -153,42 +167,51 @@ async def delete_groups(
 @router.post("/has-group")
 async def has_grouping(
     *,
+    db: ReadonlyDb,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     g: schemas.Group,
 ) -> Any:
-    return await casbin_service.has_grouping(enforcer=casbin_enforcer, g=g)
+    return await casbin_service.has_grouping(db=db, enforcer=casbin_enforcer, g=g)
 
 
 @router.get("/roles/")
 async def get_all_roles(
     *,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
 ) -> Any:
     return await casbin_service.get_all_roles(enforcer=casbin_enforcer)
 
 
-@router.get("/roles/get-users/{role}")
+@router.get("/roles/get-users/{role}", response_model=Page[str])
 async def get_users_for_role(
     *,
+    db: ReadonlyDb,
+    params: Annotated[Params, Depends(get_params)],
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
     role: str,
 ) -> Any:
-    return await casbin_service.get_users_for_role(enforcer=casbin_enforcer, role=role)
+    params = resolve_params(params)
+    limit, offset = get_limit_offset(params)
+
+    users, total = await casbin_service.get_users_for_role_count(
+        db=db, role=role, offset=offset, limit=limit
+    )
+    return create_page(users, total, params)
 
 
 @router.get("/roles/{user_email}")
 async def get_roles_for_user(
     *,
-    db: Db,
+    db: ReadonlyDb,
+    cache_connection: CacheConnection,
     # current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     user_email: str,
 ) -> Any:
     return await casbin_service.get_roles_for_user(
-        db=db, enforcer=casbin_enforcer, email=user_email
+        db=db, cache_connection=cache_connection, enforcer=casbin_enforcer, email=user_email
     )
 
 
@@ -196,19 +219,24 @@ async def get_roles_for_user(
 async def add_role_for_user(
     *,
     db: Db,
+    cache_connection: CacheConnection,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     email: Annotated[str, Body()],
     role: Annotated[str, Body()],
 ) -> Any:
     return await casbin_service.add_role_for_user(
         db=db,
+        cache_connection=cache_connection,
         enforcer=casbin_enforcer,
         email=email,
         role=role,
         available_roles=list(
             await casbin_service.get_roles_for_user(
-                db=db, enforcer=casbin_enforcer, email=current_user.email
+                db=db,
+                cache_connection=cache_connection,
+                enforcer=casbin_enforcer,
+                email=current_user.email,
             )
         ),
     )
@@ -218,11 +246,12 @@ async def add_role_for_user(
 async def delete_role_for_user(
     *,
     db: Db,
+    cache_connection: CacheConnection,
     current_user: CurrentUser,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     email: Annotated[str, Body()],
     role: Annotated[str, Body()],
 ) -> Any:
     return await casbin_service.delete_role_for_user(
-        db=db, enforcer=casbin_enforcer, email=email, role=role
+        db=db, cache_connection=cache_connection, enforcer=casbin_enforcer, email=email, role=role
     )
@@ -1,8 +1,14 @@
-from typing import Any, Sequence, Type
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Sequence, Type
 
+from loguru import logger
 from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import async_lock
+from app.core.settings import settings
 from app.src.service import ServiceBase
 
 from .. import schemas
@@ -24,6 +30,67 @@ class CasbinRuleService(ServiceBase):
         self.model = model
         self.db_repository = db_repository
         self.cache_repository = cache_repository
+        self._cache_all_lock = asyncio.Lock()
+
+    ## Cache
+
+    async def get_version(self, cache_connection: Redis) -> int:
+        return await self.cache_repository.get_cache_version(connection=cache_connection)
+
+    async def subscribe_version(self, pubsub: PubSub) -> None:
+        await self.cache_repository.subscribe_cache_version(pubsub=pubsub)
+
+    @asynccontextmanager
+    async def _lock_cache_all(self) -> AsyncGenerator[bool, None]:
+        """Single-flight the cached rule set: one coroutine per process, one process at a time.
+
+        Whoever holds the lock reads the DB after every write committed before it acquired
+        the lock, so the last rebuild to finish is never older than the last write.
+        Yield whether the lock was acquired, callers must not write the rule set otherwise.
+        """
+        async with self._cache_all_lock:
+            acquired = False
+            try:
+                async with async_lock.lock(
+                    name="casbin-rule-cache-all",
+                    lock_timeout=settings.REDIS_CACHE.CASBIN_REBUILD_LOCK_TIMEOUT,
+                    acquire_timeout=settings.REDIS_CACHE.CASBIN_REBUILD_LOCK_TIMEOUT,
+                    acquire_failed_msg="Cannot acquire casbin rule cache lock",
+                    raise_error=True,
+                ):
+                    acquired = True
+                    yield True
+            except RuntimeError:
+                if acquired:
+                    raise
+                logger.warning("casbin rule cache lock not acquired, skipping the rebuild")
+                yield False
+
+    async def _create_cache_all(self, db: AsyncSession, cache_connection: Redis) -> list[str]:
+        lines = await self.db_repository.get_all_lines(db=db)
+        if lines:
+            await self.cache_repository.create_cache_all(connection=cache_connection, lines=lines)
+        else:
+            await self.cache_repository.delete_cache_all(connection=cache_connection)
+        return lines
+
+    async def _refresh_cache(self, db: AsyncSession, cache_connection: Redis) -> int:
+        """Repopulate the cached rule set, bump the policy version and announce it to all workers.
+
+        Must run after the DB write is committed, so enforcers that observe the new version
+        never reload a rule set that predates the mutation.
+        """
+        async with self._lock_cache_all() as locked:
+            if locked:
+                await self._create_cache_all(db=db, cache_connection=cache_connection)
+            else:
+                # Drop the rule set, the next reader rebuilds it from the committed rules
+                await self.cache_repository.delete_cache_all(connection=cache_connection)
+        version = await self.cache_repository.incr_cache_version(connection=cache_connection)
+        await self.cache_repository.publish_cache_version(
+            connection=cache_connection, version=version
+        )
+        return version
 
     ## Create
 
@@ -33,10 +100,11 @@ class CasbinRuleService(ServiceBase):
         cache_connection: Redis,
         obj_in: schemas.CasbinRuleCreate,
     ) -> CasbinRule:
-        await self.cache_repository.delete_cache_all(connection=cache_connection)
         obj_in_data = obj_in.model_dump(exclude_unset=True)
         db_obj = self.model(**obj_in_data)  # type: ignore
-        return await self.db_repository.create(db=db, db_obj=db_obj)
+        casbin_rule = await self.db_repository.create(db=db, db_obj=db_obj)
+        await self._refresh_cache(db=db, cache_connection=cache_connection)
+        return casbin_rule
 
     async def creates(
         self,
@@ -44,27 +112,48 @@ class CasbinRuleService(ServiceBase):
         cache_connection: Redis,
         objs_in: list[schemas.CasbinRuleCreate],
     ) -> None:
-        await self.cache_repository.delete_cache_all(connection=cache_connection)
-        await self.db_repository.creates(
-            db=db,
-            db_objs=[self.model(**obj_in.model_dump(exclude_unset=True)) for obj_in in objs_in],
+        await self.db_repository.bulk_create(
+            db=db, values=[obj_in.model_dump(exclude_unset=True) for obj_in in objs_in]
         )
+        await self._refresh_cache(db=db, cache_connection=cache_connection)
 
     ## Get all
 
-    async def get_all(
-        self, db: AsyncSession, cache_connection: Redis
-    ) -> Sequence[CasbinRule] | None:
-        cached_casbin_rules = await self.cache_repository.get_cache_all(connection=cache_connection)
-        if cached_casbin_rules is not None:
-            return cached_casbin_rules
-        casbin_rules = await self.db_repository.get_all(db=db)
-        if not casbin_rules:
-            return None
-        await self.cache_repository.create_cache_all(
-            connection=cache_connection, obj_casbin_rules=casbin_rules
+    async def get_all(self, db: AsyncSession) -> Sequence[CasbinRule]:
+        return await self.db_repository.get_all(db=db)
+
+    async def get_all_lines(self, db: AsyncSession, cache_connection: Redis) -> list[str] | None:
+        """Return every rule rendered as a casbin policy line, served from cache if possible."""
+        cached_lines = await self.cache_repository.get_cache_all(connection=cache_connection)
+        if cached_lines is not None:
+            return cached_lines
+
+        # On a miss only one caller rebuilds, the others wait and re-read the fresh cache
+        async with self._lock_cache_all() as locked:
+            cached_lines = await self.cache_repository.get_cache_all(connection=cache_connection)
+            if cached_lines is not None:
+                return cached_lines
+            if locked:
+                lines = await self._create_cache_all(db=db, cache_connection=cache_connection)
+            else:
+                # The rebuild is stuck elsewhere, serve this load from the DB
+                lines = await self.db_repository.get_all_lines(db=db)
+
+        return lines or None
+
+    async def get_role_lines(self, db: AsyncSession) -> list[str] | None:
+        """Return the policy lines needed by a filtered enforcer, see `get_roles_for_subject`."""
+        return await self.db_repository.get_role_lines(db=db) or None
+
+    async def get_roles_for_subject(self, db: AsyncSession, *, subject: str) -> list[str]:
+        return await self.db_repository.get_roles_for_subject(db=db, subject=subject)
+
+    async def get_subjects_for_role_count(
+        self, db: AsyncSession, *, role: str, offset: int = 0, limit: int = 100
+    ) -> tuple[list[str], int]:
+        return await self.db_repository.get_subjects_for_role_count(
+            db=db, role=role, offset=offset, limit=limit
         )
-        return casbin_rules
 
     async def get_all_by_list_attribute(
         self,
@@ -135,8 +224,8 @@ class CasbinRuleService(ServiceBase):
     ## Delete
 
     async def delete(self, db: AsyncSession, cache_connection: Redis, db_obj: CasbinRule) -> None:
-        await self.cache_repository.delete_cache_all(connection=cache_connection)
         await self.db_repository.delete(db=db, db_obj=db_obj)
+        await self._refresh_cache(db=db, cache_connection=cache_connection)
 
     async def delete_by_id(
         self,
@@ -144,12 +233,12 @@ class CasbinRuleService(ServiceBase):
         cache_connection: Redis,
         id: int,  # pylint: disable=redefined-builtin
     ) -> None:
-        await self.cache_repository.delete_cache_all(connection=cache_connection)
         await self.db_repository.delete_by_id(db=db, id=id)
+        await self._refresh_cache(db=db, cache_connection=cache_connection)
 
     async def delete_all(self, db: AsyncSession, cache_connection: Redis) -> None:
-        await self.cache_repository.delete_cache_all(connection=cache_connection)
         await self.db_repository.delete_all(db=db)
+        await self._refresh_cache(db=db, cache_connection=cache_connection)
 
     async def delete_by_attribute(
         self,
@@ -164,8 +253,7 @@ class CasbinRuleService(ServiceBase):
         v4: str | None = None,
         v5: str | None = None,
     ) -> bool:
-        await self.cache_repository.delete_cache_all(connection=cache_connection)
-        return await self.db_repository.delete_by_attribute(
+        deleted = await self.db_repository.delete_by_attribute(
             db=db,
             ptype=ptype,
             v0=v0,
@@ -175,6 +263,20 @@ class CasbinRuleService(ServiceBase):
             v4=v4,
             v5=v5,
         )
+        await self._refresh_cache(db=db, cache_connection=cache_connection)
+        return deleted
+
+    async def delete_by_rules(
+        self,
+        db: AsyncSession,
+        cache_connection: Redis,
+        *,
+        ptype: str,
+        rules: list[list[str]],
+    ) -> bool:
+        deleted = await self.db_repository.delete_by_rules(db=db, ptype=ptype, rules=rules)
+        await self._refresh_cache(db=db, cache_connection=cache_connection)
+        return deleted > 0
 
     ## Update
 
@@ -185,12 +287,13 @@ class CasbinRuleService(ServiceBase):
         db_obj: CasbinRule,
         obj_in: schemas.CasbinRuleUpdate | dict[str, Any],
     ) -> CasbinRule:
-        await self.cache_repository.delete_cache_all(connection=cache_connection)
-        return await self.db_repository.update(
+        casbin_rule = await self.db_repository.update(
             db=db,
             db_obj=db_obj,
             update_data=(obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True)),
         )
+        await self._refresh_cache(db=db, cache_connection=cache_connection)
+        return casbin_rule
 
     async def update_by_attribute(
         self,
@@ -206,7 +309,6 @@ class CasbinRuleService(ServiceBase):
         v4: str | None = None,
         v5: str | None = None,
     ) -> None:
-        await self.cache_repository.delete_cache_all(connection=cache_connection)
         await self.db_repository.update_by_attribute(
             db=db,
             db_objs=[self.model(**obj_in.model_dump(exclude_unset=True)) for obj_in in objs_in],
@@ -218,20 +320,38 @@ class CasbinRuleService(ServiceBase):
             v4=v4,
             v5=v5,
         )
+        await self._refresh_cache(db=db, cache_connection=cache_connection)
+
+    async def update_by_rules(
+        self,
+        db: AsyncSession,
+        cache_connection: Redis,
+        *,
+        ptype: str,
+        old_rules: list[list[str]],
+        new_rules: list[list[str]],
+    ) -> bool:
+        updated = await self.db_repository.update_by_rules(
+            db=db, ptype=ptype, old_rules=old_rules, new_rules=new_rules
+        )
+        if updated:
+            await self._refresh_cache(db=db, cache_connection=cache_connection)
+        return updated > 0
 
-    ### Save = delete all + adds
+    ### Save = replace the stored rules, only the difference is written
     async def save(
         self,
         db: AsyncSession,
         cache_connection: Redis,
         *,
         objs_in: list[schemas.CasbinRuleCreate],
-    ) -> None:
-        await self.cache_repository.delete_cache_all(connection=cache_connection)
-        await self.db_repository.save(
-            db=db,
-            db_objs=[self.model(**obj_in.model_dump(exclude_unset=True)) for obj_in in objs_in],
+    ) -> bool:
+        changed = await self.db_repository.save(
+            db=db, values=[obj_in.model_dump(exclude_unset=True) for obj_in in objs_in]
         )
+        if changed:
+            await self._refresh_cache(db=db, cache_connection=cache_connection)
+        return changed
 
 
 casbin_rule_service = CasbinRuleService(
@@ -1,4 +1,9 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 import casbin
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.errors import forbidden, not_found
@@ -9,6 +14,11 @@ from .. import schemas
 from ..errors import (
     author_not_found,
 )
+from ..policy_freshness import ensure_fresh_policy
+from .casbin_rule_service import casbin_rule_service
+
+if TYPE_CHECKING:
+    from ..casbin_enforcer import CasbinEnforcer
 
 __all__ = ["casbin_service", "CasbinService"]
 
@@ -17,44 +27,47 @@ class CasbinService(ServiceBase):
     def __init__(self, user_service: UserService, service_name: str) -> None:
         self.user_service = user_service
 
-    async def get_policy_list(self, enforcer: casbin.AsyncEnforcer) -> list[schemas.Policy]:
-        await enforcer.load_policy()
+    # Methods read the in-memory policy after `ensure_fresh_policy`, which only reloads when
+    # the policy version moved. Writes always check the version, the snapshot is their base.
+
+    async def get_policy_list(self, enforcer: CasbinEnforcer) -> list[schemas.Policy]:
+        await ensure_fresh_policy(enforcer)
         return [
             schemas.Policy(sub=policy[0], path=policy[1], method=policy[2])
             for policy in enforcer.get_policy()
         ]
 
     async def get_policy_list_by_role(
-        self, enforcer: casbin.AsyncEnforcer, role: str
+        self, enforcer: CasbinEnforcer, role: str
     ) -> list[schemas.Policy]:
-        await enforcer.load_policy()
+        await ensure_fresh_policy(enforcer)
         return [
             schemas.Policy(sub=policy[0], path=policy[1], method=policy[2])
             for policy in enforcer.get_filtered_named_policy("p", 0, role)
         ]
 
-    async def create_policy(self, enforcer: casbin.AsyncEnforcer, p: schemas.Policy) -> None:
-        await enforcer.load_policy()
+    async def create_policy(self, enforcer: CasbinEnforcer, p: schemas.Policy) -> None:
+        await ensure_fresh_policy(enforcer, check_remote=True)
         if not enforcer.has_policy(p.sub, p.path, p.method):
             await enforcer.add_policy(p.sub, p.path, p.method)
 
-    async def has_policy(self, enforcer: casbin.AsyncEnforcer, p: schemas.Policy) -> bool:
-        await enforcer.load_policy()
+    async def has_policy(self, enforcer: CasbinEnforcer, p: schemas.Policy) -> bool:
+        await ensure_fresh_policy(enforcer)
         return enforcer.has_policy(p.sub, p.path, p.method)
 
     async def create_policies(
-        self, enforcer: casbin.AsyncEnforcer, ps: list[schemas.Policy]
+        self, enforcer: CasbinEnforcer, ps: list[schemas.Policy]
     ) -> None:
-        await enforcer.load_policy()
+        await ensure_fresh_policy(enforcer, check_remote=True)
         await enforcer.add_policies([list(p.dict().values()) for p in ps])
 
     async def update_policy(
         self,
-        enforcer: casbin.AsyncEnforcer,
+        enforcer: CasbinEnforcer,
         old: schemas.Policy,
         new: schemas.Policy,
     ) -> None:
-        await enforcer.load_policy()
+        await ensure_fresh_policy(enforcer, check_remote=True)
         if not enforcer.has_policy(old.sub, old.path, old.method):
             raise author_not_found(
                 msg=f"not found old policy, old.sub: {old.sub}, old.path: {old.path}, old.method: {old.method}"  # noqa: B950,E501
@@ -65,125 +78,213 @@ class CasbinService(ServiceBase):
 
     async def update_policies(
         self,
-        enforcer: casbin.AsyncEnforcer,
+        enforcer: CasbinEnforcer,
         old: list[schemas.Policy],
         new: list[schemas.Policy],
     ) -> None:
-        await enforcer.load_policy()
+        await ensure_fresh_policy(enforcer, check_remote=True)
         await enforcer.update_policies(
             [list(o.dict().values()) for o in old],
             [list(n.dict().values()) for n in new],
         )
 
-    async def delete_policy(self, enforcer: casbin.AsyncEnforcer, p: schemas.Policy) -> None:
-        await enforcer.load_policy()
+    async def delete_policy(self, enforcer: CasbinEnforcer, p: schemas.Policy) -> None:
+        await ensure_fresh_policy(enforcer, check_remote=True)
         await enforcer.remove_policy(p.sub, p.path, p.method)
 
     async def delete_policies(
-        self, enforcer: casbin.AsyncEnforcer, ps: list[schemas.Policy]
+        self, enforcer: CasbinEnforcer, ps: list[schemas.Policy]
     ) -> None:
-        await enforcer.load_policy()
+        await ensure_fresh_policy(enforcer, check_remote=True)
         await enforcer.remove_policies([list(p.dict().values()) for p in ps])
 
-    async def get_group_list(self, enforcer: casbin.AsyncEnforcer) -> list[schemas.Group]:
-        await enforcer.load_policy()
+    ## Groups: a filtered snapshot has no user -> role rules, casbin would answer from the
+    ## snapshot and skip removing rules it doesn't hold, so `g` rules are read from the DB
+
+    async def _get_groupings(
+        self, db: AsyncSession, enforcer: CasbinEnforcer
+    ) -> list[list[str]]:
+        if not enforcer.is_filtered():
+            return enforcer.get_grouping_policy()
+
+        rules = await casbin_rule_service.get_all_by_list_attribute(db=db, ptype=["g"])
+        return [[rule.v0, rule.v1] for rule in rules if rule.v0 is not None and rule.v1 is not None]
+
+    async def _has_grouping(
+        self, db: AsyncSession, enforcer: CasbinEnforcer, rule: list[str]
+    ) -> bool:
+        if not enforcer.is_filtered():
+            return enforcer.has_grouping_policy(rule)
+
+        return (
+            await casbin_rule_service.get_by_attribute(
+                db=db, ptype="g", **{f"v{id}": value for id, value in enumerate(rule)}
+            )
+        ) is not None
+
+    async def _add_groupings(
+        self, db: AsyncSession, enforcer: CasbinEnforcer, rules: list[list[str]]
+    ) -> None:
+        rules = [rule for rule in rules if not await self._has_grouping(db, enforcer, rule)]
+        if rules:
+            await enforcer.add_grouping_policies(rules)
+
+    async def _remove_groupings(
+        self, enforcer: CasbinEnforcer, rules: list[list[str]]
+    ) -> None:
+        if not enforcer.is_filtered():
+            await enforcer.remove_grouping_policies(rules)
+            return
+
+        loaded = [rule for rule in rules if enforcer.has_grouping_policy(rule)]
+        if loaded:
+            await enforcer.remove_grouping_policies(loaded)
+        unloaded = [rule for rule in rules if rule not in loaded]
+        if unloaded:
+            # Remove them in storage, the version bump reloads the snapshot and the cached
+            # subject roles
+            await enforcer.get_adapter().remove_policies("g", "g", unloaded)
+            await ensure_fresh_policy(enforcer, check_remote=True)
+
+    async def get_group_list(
+        self, db: AsyncSession, enforcer: CasbinEnforcer
+    ) -> list[schemas.Group]:
+        await ensure_fresh_policy(enforcer)
         return [
-            schemas.Group(sub1=group[0], sub2=group[1]) for group in enforcer.get_grouping_policy()
+            schemas.Group(sub1=group[0], sub2=group[1])
+            for group in await self._get_groupings(db=db, enforcer=enforcer)
         ]
 
-    async def create_group(self, enforcer: casbin.AsyncEnforcer, g: schemas.Group) -> None:
-        await enforcer.load_policy()
-        if not enforcer.has_grouping_policy(g.sub1, g.sub2):
-            await enforcer.add_grouping_policy(g.sub1, g.sub2)
+    async def create_group(
+        self, db: AsyncSession, enforcer: CasbinEnforcer, g: schemas.Group
+    ) -> None:
+        await ensure_fresh_policy(enforcer, check_remote=True)
+        await self._add_groupings(db=db, enforcer=enforcer, rules=[[g.sub1, g.sub2]])
+
+    async def create_groups(
+        self, db: AsyncSession, enforcer: CasbinEnforcer, gs: list[schemas.Group]
+    ) -> None:
+        await ensure_fresh_policy(enforcer, check_remote=True)
+        await self._add_groupings(
+            db=db, enforcer=enforcer, rules=[list(g.dict().values()) for g in gs]
+        )
+
+    async def delete_group(self, enforcer: CasbinEnforcer, g: schemas.Group) -> None:
+        await ensure_fresh_policy(enforcer, check_remote=True)
+        await self._remove_groupings(enforcer=enforcer, rules=[[g.sub1, g.sub2]])
 
-    async def create_groups(self, enforcer: casbin.AsyncEnforcer, gs: list[schemas.Group]) -> None:
-        await enforcer.load_policy()
-        await enforcer.add_grouping_policies([list(g.dict().values()) for g in gs])
+    async def delete_groups(self, enforcer: CasbinEnforcer, gs: list[schemas.Group]) -> None:
+        await ensure_fresh_policy(enforcer, check_remote=True)
+        await self._remove_groupings(
+            enforcer=enforcer, rules=[list(g.dict().values()) for g in gs]
+        )
 
-    async def delete_group(self, enforcer: casbin.AsyncEnforcer, g: schemas.Group) -> None:
-        await enforcer.load_policy()
-        await enforcer.remove_grouping_policy(g.sub1, g.sub2)
+    async def has_grouping(
+        self, db: AsyncSession, enforcer: CasbinEnforcer, g: schemas.Group
+    ) -> bool:
+        await ensure_fresh_policy(enforcer)
+        return await self._has_grouping(db=db, enforcer=enforcer, rule=[g.sub1, g.sub2])
 
-    async def delete_groups(self, enforcer: casbin.AsyncEnforcer, gs: list[schemas.Group]) -> None:
-        await enforcer.load_policy()
-        await enforcer.remove_grouping_policies([list(g.dict().values()) for g in gs])
+    async def seed_policy(
+        self, db: AsyncSession, enforcer: CasbinEnforcer, source: casbin.AsyncEnforcer
+    ) -> None:
+        """Add the rules of `source` missing from `enforcer`, one bulk insert per rule type."""
+        await ensure_fresh_policy(enforcer, check_remote=True)
+        policies = [p for p in source.get_policy() if not enforcer.has_policy(p)]
+        if policies:
+            await enforcer.add_policies(policies)
 
-    async def has_grouping(self, enforcer: casbin.AsyncEnforcer, g: schemas.Group) -> bool:
-        await enforcer.load_policy()
-        return enforcer.has_grouping_policy(g.sub1, g.sub2)
+        await self._add_groupings(db=db, enforcer=enforcer, rules=source.get_grouping_policy())
 
-    async def get_all_roles(self, enforcer: casbin.AsyncEnforcer) -> list[str]:
-        await enforcer.load_policy()
+    async def get_all_roles(self, enforcer: CasbinEnforcer) -> list[str]:
+        await ensure_fresh_policy(enforcer)
         return enforcer.get_all_roles()
 
-    async def get_roles_for_user(
-        self, db: AsyncSession, enforcer: casbin.AsyncEnforcer, email: str
-    ) -> list[str]:
-        await enforcer.load_policy()
+    ## User roles, read from the `g` rows of the casbin rule table by index
+
+    async def _check_user_exists(
+        self, db: AsyncSession, cache_connection: Redis | None, email: str
+    ) -> None:
         if (
-            await self.user_service.get_by_email(db=db, cache_connection=None, email=email)
+            await self.user_service.get_by_email(
+                db=db, cache_connection=cache_connection, email=email
+            )
         ) is None:
             raise not_found(f"user not found, email: {email}")
 
-        return await enforcer.get_implicit_roles_for_user(name=email)
-
-    async def get_users_for_role(self, enforcer: casbin.AsyncEnforcer, role: str) -> list[str]:
-        await enforcer.load_policy()
-        return await enforcer.get_users_for_role(name=role)
+    async def get_roles_for_user(
+        self,
+        db: AsyncSession,
+        enforcer: CasbinEnforcer,
+        email: str,
+        cache_connection: Redis | None = None,
+    ) -> list[str]:
+        await ensure_fresh_policy(enforcer)
+        await self._check_user_exists(db=db, cache_connection=cache_connection, email=email)
+
+        # Direct roles come from the DB, their inheritance from the in-memory role rules,
+        # which a filtered snapshot keeps as well
+        roles = await casbin_rule_service.get_roles_for_subject(db=db, subject=email)
+        implicit_roles = list(roles)
+        for role in roles:
+            for implicit_role in await enforcer.get_implicit_roles_for_user(name=role):
+                if implicit_role not in implicit_roles:
+                    implicit_roles.append(implicit_role)
+        return implicit_roles
+
+    async def get_users_for_role_count(
+        self, db: AsyncSession, role: str, offset: int = 0, limit: int = 100
+    ) -> tuple[list[str], int]:
+        return await casbin_rule_service.get_subjects_for_role_count(
+            db=db, role=role, offset=offset, limit=limit
+        )
 
     async def add_role_for_user(
         self,
         db: AsyncSession,
-        enforcer: casbin.AsyncEnforcer,
+        enforcer: CasbinEnforcer,
         email: str,
         role: str,
         available_roles: list[str] | None = None,
+        cache_connection: Redis | None = None,
     ) -> None:
-        await enforcer.load_policy()
+        await ensure_fresh_policy(enforcer, check_remote=True)
         if available_roles is not None and role not in available_roles:
             raise forbidden("user doesn't have enough privileges to add role")
 
-        if (
-            await self.user_service.get_by_email(db=db, cache_connection=None, email=email)
-        ) is None:
-            raise not_found(f"user not found, email: {email}")
+        await self._check_user_exists(db=db, cache_connection=cache_connection, email=email)
 
-        if not await enforcer.has_role_for_user(name=email, role=role):
+        if role not in await casbin_rule_service.get_roles_for_subject(db=db, subject=email):
             await enforcer.add_role_for_user(user=email, role=role)
 
     async def has_role_for_user(
         self,
         db: AsyncSession,
-        enforcer: casbin.AsyncEnforcer,
+        enforcer: CasbinEnforcer,
         email: str,
         role: str,
         available_roles: list[str] | None = None,
-    ) -> None:
-        await enforcer.load_policy()
+        cache_connection: Redis | None = None,
+    ) -> bool:
         if available_roles is not None and role not in available_roles:
             raise forbidden("user doesn't have enough privileges to add role")
 
-        if (
-            await self.user_service.get_by_email(db=db, cache_connection=None, email=email)
-        ) is None:
-            raise not_found(f"user not found, email: {email}")
+        await self._check_user_exists(db=db, cache_connection=cache_connection, email=email)
 
-        await enforcer.has_role_for_user(name=email, role=role)
+        return role in await casbin_rule_service.get_roles_for_subject(db=db, subject=email)
 
     async def delete_role_for_user(
         self,
         db: AsyncSession,
-        enforcer: casbin.AsyncEnforcer,
+        enforcer: CasbinEnforcer,
         email: str,
         role: str,
+        cache_connection: Redis | None = None,
     ) -> None:
-        await enforcer.load_policy()
-        if (
-            await self.user_service.get_by_email(db=db, cache_connection=None, email=email)
-        ) is None:
-            raise not_found(f"user not found, email: {email}")
+        await ensure_fresh_policy(enforcer, check_remote=True)
+        await self._check_user_exists(db=db, cache_connection=cache_connection, email=email)
 
-        await enforcer.delete_role_for_user(user=email, role=role)
+        await self._remove_groupings(enforcer=enforcer, rules=[[email, role]])
 
 
 casbin_service = CasbinService(user_service=user_service, service_name="casbin")
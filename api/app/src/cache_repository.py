@@ -1,29 +1,113 @@
-from typing import Any, ParamSpec, TypeVar
+from typing import Any, Mapping, ParamSpec, TypeVar
 
 from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
+
+from app.core.cache.codecs import CacheCodec
+from app.core.settings import settings
+from app.core.settings.redis import CacheCodecSettings
 
 Param = ParamSpec("Param")
 RetType = TypeVar("RetType")
 
+# Characters with a meaning in SCAN MATCH patterns
+_GLOB_ESCAPE = str.maketrans({char: f"\\{char}" for char in "\\*?[]^"})
+
 
 class BaseCacheRepository:
     def __init__(self, repository_name: str) -> None:
-        pass
+        # Values go through the codec configured for the repository in REDIS_CACHE.CODECS
+        codec_settings = settings.REDIS_CACHE.CODECS.get(repository_name, CacheCodecSettings())
+        self.codec = CacheCodec(
+            serializer=codec_settings.SERIALIZER,
+            compression=codec_settings.COMPRESSION,
+            compress_min_size=codec_settings.COMPRESS_MIN_SIZE,
+        )
 
     async def create(self, connection: Redis, key: str, value: Any, ttl: int | None = None) -> None:
-        await connection.set(key, value, ex=ttl)
+        await connection.set(key, self.codec.encode(value), ex=ttl)
 
     async def get(self, connection: Redis, key: str, ttl: int | None = None) -> Any | None:
-        value = await connection.get(key)
-        if value is None:
-            return None
         if ttl is not None:
-            await connection.expire(name=key, time=ttl, gt=True)
-        return value
+            return await self.get_and_touch(connection=connection, key=key, ttl=ttl)
+        return self.codec.decode(await connection.get(key))
+
+    async def get_and_touch(self, connection: Redis, key: str, ttl: int) -> Any | None:
+        """GET that also slides the key's TTL, in a single round trip (GETEX)."""
+        return self.codec.decode(await connection.getex(key, ex=ttl))
+
+    async def mget(self, connection: Redis, keys: list[str]) -> list[Any | None]:
+        """Values of `keys` in input order, None for missing keys."""
+        if not keys:
+            return []
+        return [self.codec.decode(value) for value in await connection.mget(keys)]
+
+    async def get_and_touch_many(
+        self, connection: Redis, keys: list[str], ttl: int
+    ) -> list[Any | None]:
+        """`get_and_touch` for several keys, pipelined into a single round trip."""
+        if not keys:
+            return []
+        async with connection.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.getex(key, ex=ttl)
+            values = await pipe.execute()
+        return [self.codec.decode(value) for value in values]
 
     async def delete(self, connection: Redis, key: str) -> None:
         await connection.delete(key)
 
+    ## Bulk
+
+    async def get_many(
+        self, connection: Redis, keys: list[str], ttl: int | None = None
+    ) -> list[Any | None]:
+        """Values of `keys` in input order, sliding their TTL when `ttl` is given."""
+        if ttl is not None:
+            return await self.get_and_touch_many(connection=connection, keys=keys, ttl=ttl)
+        return await self.mget(connection=connection, keys=keys)
+
+    async def set_many(
+        self,
+        connection: Redis,
+        values: Mapping[str, Any],
+        ttl: int | Mapping[str, int | None] | None = None,
+    ) -> None:
+        """Set every key of `values` in one pipeline, `ttl` is shared or given per key."""
+        if not values:
+            return
+        async with connection.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                pipe.set(
+                    key,
+                    self.codec.encode(value),
+                    ex=ttl.get(key) if isinstance(ttl, Mapping) else ttl,
+                )
+            await pipe.execute()
+
+    async def delete_many(self, connection: Redis, keys: list[str]) -> int:
+        if not keys:
+            return 0
+        return await connection.delete(*keys)
+
+    async def delete_by_prefix(self, connection: Redis, prefix: str, batch_size: int = 500) -> int:
+        """Delete every key starting with `prefix`, scanning and unlinking in batches."""
+        deleted = 0
+        batch: list[bytes] = []
+        async for key in connection.scan_iter(
+            match=f"{prefix.translate(_GLOB_ESCAPE)}*", count=batch_size
+        ):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                deleted += await connection.unlink(*batch)
+                batch = []
+        if batch:
+            deleted += await connection.unlink(*batch)
+        return deleted
+
+    async def incr(self, connection: Redis, key: str) -> int:
+        return await connection.incr(key)
+
     async def set_add(self, connection: Redis, key: str, value: str) -> None:
         await connection.sadd(key, value)
 
@@ -35,3 +119,9 @@ class BaseCacheRepository:
 
     async def set_delete(self, connection: Redis, key: str, value: str) -> None:
         await connection.srem(key, value)
+
+    async def publish(self, connection: Redis, channel: str, message: Any) -> None:
+        await connection.publish(channel, message)
+
+    async def subscribe(self, pubsub: PubSub, channel: str) -> None:
+        await pubsub.subscribe(channel)
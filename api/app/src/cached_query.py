@@ -0,0 +1,250 @@
+import asyncio
+import inspect
+import time
+from typing import Any, Awaitable, Callable, Generic, TypeVar
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from app.core.cache.cache_connections import async_cache_connection
+from app.core.db.db_connections import async_db_connection
+
+from .cache_repository import BaseCacheRepository
+
+__all__ = ["cached_query", "CachedQuery"]
+
+RetType = TypeVar("RetType")
+
+TTL = int | Callable[[], int]
+
+
+def _resolve_ttl(ttl: TTL | None) -> int | None:
+    return ttl() if callable(ttl) else ttl
+
+
+class CachedQuery(Generic[RetType]):
+    """Read-through cache around a service query method, see `cached_query`."""
+
+    def __init__(
+        self,
+        func: Callable[..., Awaitable[RetType | None]],
+        *,
+        key: str,
+        ttl: TTL,
+        dump: Callable[[RetType], Any],
+        load: Callable[[Any], RetType],
+        negative_ttl: TTL | None,
+        stale_ttl: TTL | None,
+        repository_attr: str,
+    ) -> None:
+        self.func = func
+        self.key = key
+        self.ttl = ttl
+        self.dump = dump
+        self.load = load
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.repository_attr = repository_attr
+        self._signature = inspect.signature(func)
+        # key -> the in-flight load of that key in this process, resolving to the dumped value
+        self._inflight: dict[str, asyncio.Future[Any]] = {}
+        self._refreshing: set[asyncio.Task[None]] = set()
+        self.__doc__ = func.__doc__
+        self.__name__ = func.__name__
+
+    def __get__(self, instance: Any, owner: Any = None) -> Any:
+        if instance is None:
+            return self
+        return BoundCachedQuery(self, instance)
+
+    ## Storage
+
+    @property
+    def _enveloped(self) -> bool:
+        # Plain entries keep the layout of values written by hand through the cache repository
+        return self.negative_ttl is not None or self.stale_ttl is not None
+
+    def _repository(self, instance: Any) -> BaseCacheRepository:
+        return getattr(instance, self.repository_attr)
+
+    async def _read(
+        self, instance: Any, cache_connection: Redis, key: str
+    ) -> tuple[bool, Any, bool]:
+        """Return (hit, dumped value, stale)."""
+        repository = self._repository(instance)
+        if not self._enveloped:
+            value = await repository.get_and_touch(
+                connection=cache_connection, key=key, ttl=_resolve_ttl(self.ttl)  # type: ignore
+            )
+            return value is not None, value, False
+
+        envelope = await repository.get(connection=cache_connection, key=key)
+        if envelope is None:
+            return False, None, False
+        return True, envelope["value"], time.time() >= envelope["fresh_until"]
+
+    async def _write(self, instance: Any, cache_connection: Redis, key: str, dumped: Any) -> None:
+        repository = self._repository(instance)
+        if not self._enveloped:
+            if dumped is not None:
+                await repository.create(
+                    connection=cache_connection, key=key, value=dumped, ttl=_resolve_ttl(self.ttl)
+                )
+            return
+
+        if dumped is None:
+            if self.negative_ttl is None:
+                return
+            fresh_for = _resolve_ttl(self.negative_ttl) or 0
+        else:
+            fresh_for = _resolve_ttl(self.ttl) or 0
+        await repository.create(
+            connection=cache_connection,
+            key=key,
+            value={"value": dumped, "fresh_until": time.time() + fresh_for},
+            ttl=fresh_for + (_resolve_ttl(self.stale_ttl) or 0),
+        )
+
+    ## Loading
+
+    def _bind(self, instance: Any, args: Any, kwargs: Any) -> inspect.BoundArguments:
+        bound = self._signature.bind(instance, *args, **kwargs)
+        bound.apply_defaults()
+        return bound
+
+    async def _load(self, bound: inspect.BoundArguments, key: str) -> tuple[Any, Any]:
+        """Run the query and cache its result, return (result, dumped result)."""
+        result = await self.func(*bound.args, **bound.kwargs)
+        dumped = None if result is None else self.dump(result)
+        await self._write(bound.args[0], bound.arguments["cache_connection"], key, dumped)
+        return result, dumped
+
+    async def _load_single_flight(self, bound: inspect.BoundArguments, key: str) -> Any:
+        """Only one load per key runs in this process, concurrent callers share its result.
+
+        Followers get their own instance built from the dumped value, instances bound to the
+        leader's DB session are never shared.
+        """
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            dumped = await asyncio.shield(inflight)
+            return None if dumped is None else self.load(dumped)
+
+        future: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result, dumped = await self._load(bound, key)
+        except BaseException as e:
+            future.set_exception(e)
+            # Followers see the error, don't warn about it never being retrieved
+            future.exception()
+            raise
+        else:
+            future.set_result(dumped)
+            return result
+        finally:
+            del self._inflight[key]
+
+    async def _refresh(self, bound: inspect.BoundArguments, key: str) -> None:
+        try:
+            async with async_db_connection.session() as db:
+                async with async_cache_connection.session() as cache_connection:
+                    bound.arguments["db"] = db
+                    bound.arguments["cache_connection"] = cache_connection
+                    await self._load_single_flight(bound, key)
+        except Exception:  # noqa: B902
+            logger.exception("cache refresh of {key} failed", key=key)
+
+    def _schedule_refresh(self, bound: inspect.BoundArguments, key: str) -> None:
+        if key in self._inflight:
+            return
+        task = asyncio.create_task(self._refresh(bound, key))
+        self._refreshing.add(task)
+        task.add_done_callback(self._refreshing.discard)
+
+    async def call(self, instance: Any, *args: Any, **kwargs: Any) -> RetType | None:
+        bound = self._bind(instance, args, kwargs)
+        cache_connection = bound.arguments.get("cache_connection")
+        if cache_connection is None:
+            return await self.func(*bound.args, **bound.kwargs)
+
+        key = self.key.format(**bound.arguments)
+        hit, dumped, stale = await self._read(instance, cache_connection, key)
+        if not hit:
+            return await self._load_single_flight(bound, key)
+
+        if stale:
+            # Serve the stale value, the request's session can't outlive it: refresh with our own
+            self._schedule_refresh(self._bind(instance, args, kwargs), key)
+        return None if dumped is None else self.load(dumped)
+
+
+class BoundCachedQuery(Generic[RetType]):
+    """`CachedQuery` bound to a service instance, with write-through helpers."""
+
+    def __init__(self, query: CachedQuery[RetType], instance: Any) -> None:
+        self.query = query
+        self.instance = instance
+
+    async def __call__(self, *args: Any, **kwargs: Any) -> RetType | None:
+        return await self.query.call(self.instance, *args, **kwargs)
+
+    async def get_cached(self, cache_connection: Redis, **key_args: Any) -> RetType | None:
+        """Return the cached result only, None on a miss or a cached miss."""
+        _, dumped, _ = await self.query._read(
+            self.instance, cache_connection, self.query.key.format(**key_args)
+        )
+        return None if dumped is None else self.query.load(dumped)
+
+    async def set(self, cache_connection: Redis, value: RetType | None, **key_args: Any) -> None:
+        """Write `value` through to the cache, as if the query had just returned it."""
+        await self.query._write(
+            self.instance,
+            cache_connection,
+            self.query.key.format(**key_args),
+            None if value is None else self.query.dump(value),
+        )
+
+    async def invalidate(self, cache_connection: Redis, **key_args: Any) -> None:
+        await self.query._repository(self.instance).delete(
+            connection=cache_connection, key=self.query.key.format(**key_args)
+        )
+
+
+def cached_query(
+    *,
+    key: str,
+    ttl: TTL,
+    dump: Callable[[Any], Any] = lambda value: value,
+    load: Callable[[Any], Any] = lambda value: value,
+    negative_ttl: TTL | None = None,
+    stale_ttl: TTL | None = None,
+    repository_attr: str = "cache_repository",
+) -> Callable[[Callable[..., Awaitable[Any]]], CachedQuery[Any]]:
+    """Cache a service query method in Redis, through the service's cache repository.
+
+    The method must take `db` and `cache_connection` arguments; with `cache_connection=None`
+    the cache is bypassed. `key` is formatted with the call arguments, `dump`/`load` convert
+    results to and from a value the repository codec can store.
+
+    - `negative_ttl`: also cache a None result, for that many seconds
+    - `stale_ttl`: keep serving a result that many seconds past `ttl` while it is reloaded
+      in the background
+    - concurrent misses of a key in one process share a single query
+
+    Call `.set(...)` after writes to write through and `.invalidate(...)` to evict.
+    """
+
+    def decorator(func: Callable[..., Awaitable[Any]]) -> CachedQuery[Any]:
+        return CachedQuery(
+            func,
+            key=key,
+            ttl=ttl,
+            dump=dump,
+            load=load,
+            negative_ttl=negative_ttl,
+            stale_ttl=stale_ttl,
+            repository_attr=repository_attr,
+        )
+
+    return decorator
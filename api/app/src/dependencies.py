@@ -10,10 +10,29 @@ from app.errors import internal_server_error
 
 
 async def get_db() -> AsyncIterator[AsyncSession]:
+    """Request session, connected lazily: cache-only requests never check out a connection."""
     async with async_db_connection.session() as session:
         yield session
 
 
+async def get_db_readonly() -> AsyncIterator[AsyncSession]:
+    """Request session running READ COMMITTED read only transactions."""
+    async with async_db_connection.session("readonly") as session:
+        yield session
+
+
+async def get_db_serializable() -> AsyncIterator[AsyncSession]:
+    """Request session running SERIALIZABLE transactions, for read-then-write flows."""
+    async with async_db_connection.session("serializable") as session:
+        yield session
+
+
+async def get_db_replica() -> AsyncIterator[AsyncSession]:
+    """Read only request session on a replica, may lag behind the primary."""
+    async with async_db_connection.replica_session() as session:
+        yield session
+
+
 async def get_async_cache() -> AsyncIterator[redis.Redis]:
     async with async_cache_connection.session() as es:
         yield es
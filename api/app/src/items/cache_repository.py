@@ -0,0 +1,8 @@
+from app.src.cache_repository import BaseCacheRepository
+
+
+class ItemCacheRepository(BaseCacheRepository):
+    ITEM_BY_ID_KEY = "Cache:Item:{id}"
+
+
+item_cache_repository = ItemCacheRepository(repository_name="item")
@@ -3,13 +3,14 @@ from typing import Annotated, Any
 from fastapi import Depends
 from fastapi_pagination.api import create_page, resolve_params
 from fastapi_pagination.default import Page, Params
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.http.api_router import APIRouter
 from app.schemas import create_successful_response, SuccessfulResponse
 from app.src.authen.dependencies import get_current_active_authorized
-from app.src.dependencies import get_db
-from app.src.users.db_models import User
+from app.src.dependencies import get_async_cache, get_db, get_db_readonly, get_db_replica
+from app.src.users.principal import UserPrincipal
 from app.utils import get_limit_offset, get_params
 
 from .. import errors, schemas
@@ -17,28 +18,34 @@ from ..services import item_service
 
 router = APIRouter()
 
-CurrentUser = Annotated[User, Depends(get_current_active_authorized)]
+CurrentUser = Annotated[UserPrincipal, Depends(get_current_active_authorized)]
 Db = Annotated[AsyncSession, Depends(get_db)]
+ReadonlyDb = Annotated[AsyncSession, Depends(get_db_readonly)]
+ReplicaDb = Annotated[AsyncSession, Depends(get_db_replica)]
+CacheConnection = Annotated[Redis, Depends(get_async_cache)]
 
 
 @router.post("/", response_model=SuccessfulResponse[schemas.Item])
 async def create_item(
     *,
     db: Db,
+    cache_connection: CacheConnection,
     item_in: schemas.ItemCreate,
     current_user: CurrentUser,
 ) -> Any:
     """
     Create new item.
     """
-    item = await item_service.create_with_owner(db=db, obj_in=item_in, owner_id=current_user.id)
+    item = await item_service.create_with_owner(
+        db=db, cache_connection=cache_connection, obj_in=item_in, owner_id=current_user.id
+    )
     return create_successful_response(data=item)
 
 
 @router.get("/", response_model=SuccessfulResponse[Page[schemas.Item]])
 async def read_items(
     *,
-    db: Db,
+    db: ReplicaDb,
     params: Annotated[Params, Depends(get_params)],
     current_user: CurrentUser,
 ) -> Any:
@@ -55,14 +62,15 @@ async def read_items(
 @router.get("/{id}", response_model=SuccessfulResponse[schemas.Item])
 async def read_item(
     *,
-    db: Db,
+    db: ReadonlyDb,
+    cache_connection: CacheConnection,
     id: int,
     current_user: CurrentUser,
 ) -> Any:
     """
     Get item by ID.
     """
-    item = await item_service.get(db=db, id=id)
+    item = await item_service.get(db=db, id=id, cache_connection=cache_connection)
     if not item:
         raise errors.item_not_found()
     return create_successful_response(data=item)
@@ -72,6 +80,7 @@ async def read_item(
 async def update_item(
     *,
     db: Db,
+    cache_connection: CacheConnection,
     id: int,
     item_in: schemas.ItemUpdate,
     current_user: CurrentUser,
@@ -82,7 +91,9 @@ async def update_item(
     item = await item_service.get(db=db, id=id)
     if not item:
         raise errors.item_not_found()
-    item = await item_service.update(db=db, db_obj=item, obj_in=item_in)
+    item = await item_service.update(
+        db=db, cache_connection=cache_connection, db_obj=item, obj_in=item_in
+    )
     return create_successful_response(data=item)
 
 
@@ -90,6 +101,7 @@ async def update_item(
 async def delete_item(
     *,
     db: Db,
+    cache_connection: CacheConnection,
     id: int,
     current_user: CurrentUser,
 ) -> Any:
@@ -101,6 +113,6 @@ async def delete_item(
     if not item:
         raise errors.item_not_found()
 
-    await item_service.delete_by_id(db=db, id=id)
+    await item_service.delete_by_id(db=db, cache_connection=cache_connection, id=id)
 
     return create_successful_response(data=item)
@@ -2,7 +2,7 @@ from pydantic import BaseModel, ConfigDict
 
 from app.schemas import OptionalField
 
-__all__ = ["Item", "ItemCreate", "ItemUpdate"]
+__all__ = ["Item", "ItemCreate", "ItemInDB", "ItemUpdate"]
 
 
 class ItemBase(BaseModel):
@@ -34,3 +34,8 @@ class Item(ItemInDBBase):
     model_config = ConfigDict(from_attributes=True)
 
     # owner: User
+
+
+# Properties stored in DB
+class ItemInDB(ItemInDBBase):
+    owner_id: OptionalField[int] = None
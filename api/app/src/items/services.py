@@ -1,34 +1,58 @@
 from typing import Any, Sequence, Type
 
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.settings import settings
+from app.src.cached_query import cached_query
 from app.src.service import ServiceBase
 
+from .cache_repository import item_cache_repository, ItemCacheRepository
 from .db_models import Item
 from .db_repository import item_db_repository, ItemDbRepository
-from .schemas import ItemCreate, ItemUpdate
+from .schemas import ItemCreate, ItemInDB, ItemUpdate
+
+
+def _dump_item(item: Item) -> dict[str, Any]:
+    return ItemInDB.model_validate(item).model_dump(mode="json")
+
+
+def _load_item(value: dict[str, Any]) -> Item:
+    return Item(**ItemInDB.model_validate(value).model_dump())
 
 
 class ItemService(ServiceBase):
     def __init__(
-        self, model: Type[Item], db_repository: ItemDbRepository, service_name: str
+        self,
+        model: Type[Item],
+        db_repository: ItemDbRepository,
+        cache_repository: ItemCacheRepository,
+        service_name: str,
     ) -> None:
         self.model = model
         self.db_repository = db_repository
+        self.cache_repository = cache_repository
 
     ## Create
 
-    async def create(self, db: AsyncSession, obj_in: ItemCreate) -> Item:
+    async def create(
+        self, db: AsyncSession, cache_connection: Redis, obj_in: ItemCreate
+    ) -> Item:
         obj_in_data = obj_in.model_dump(exclude_unset=True)
         db_obj = self.model(**obj_in_data)  # type: ignore
-        return await self.db_repository.create(db=db, db_obj=db_obj)
+        item = await self.db_repository.create(db=db, db_obj=db_obj)
+        # Overwrites a cached miss of the id
+        await self.get.set(cache_connection, item, id=item.id)
+        return item
 
     async def create_with_owner(
-        self, db: AsyncSession, *, obj_in: ItemCreate, owner_id: int
+        self, db: AsyncSession, cache_connection: Redis, *, obj_in: ItemCreate, owner_id: int
     ) -> Item:
         obj_in_data = obj_in.model_dump(exclude_unset=True)
         db_obj = self.model(**obj_in_data, owner_id=owner_id)  # type: ignore
-        return await self.db_repository.create(db=db, db_obj=db_obj)
+        item = await self.db_repository.create(db=db, db_obj=db_obj)
+        await self.get.set(cache_connection, item, id=item.id)
+        return item
 
     ## Get all
 
@@ -69,35 +93,60 @@ class ItemService(ServiceBase):
         return items, total
 
     ## Get one
+
+    # Cached items are detached, pass `cache_connection=None` to get one that can be updated
+    @cached_query(
+        key=ItemCacheRepository.ITEM_BY_ID_KEY,
+        ttl=lambda: settings.REDIS_CACHE.ITEM_TTL,
+        dump=_dump_item,
+        load=_load_item,
+        negative_ttl=lambda: settings.REDIS_CACHE.ITEM_NEGATIVE_TTL,
+        stale_ttl=lambda: settings.REDIS_CACHE.ITEM_STALE_TTL,
+    )
     async def get(
         self,
         db: AsyncSession,
         id: int,  # pylint: disable=redefined-builtin
+        cache_connection: Redis | None = None,
     ) -> Item | None:
         return await self.db_repository.get(db=db, id=id)
 
     ## Delete
 
-    async def delete(self, db: AsyncSession, db_obj: Item) -> None:
+    async def delete(self, db: AsyncSession, cache_connection: Redis, db_obj: Item) -> None:
         await self.db_repository.delete(db=db, db_obj=db_obj)
+        await self.get.invalidate(cache_connection, id=db_obj.id)
 
     async def delete_by_id(
         self,
         db: AsyncSession,
+        cache_connection: Redis,
         id: int,  # pylint: disable=redefined-builtin
     ) -> None:
         await self.db_repository.delete_by_id(db=db, id=id)
+        await self.get.invalidate(cache_connection, id=id)
 
     ## Update
 
     async def update(
-        self, db: AsyncSession, db_obj: Item, obj_in: ItemUpdate | dict[str, Any]
+        self,
+        db: AsyncSession,
+        cache_connection: Redis,
+        db_obj: Item,
+        obj_in: ItemUpdate | dict[str, Any],
     ) -> Item:
-        return await self.db_repository.update(
+        item = await self.db_repository.update(
             db=db,
             db_obj=db_obj,
             update_data=(obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True)),
         )
+        await self.get.set(cache_connection, item, id=item.id)
+        return item
 
 
-item_service = ItemService(model=Item, db_repository=item_db_repository, service_name="item")
+item_service = ItemService(
+    model=Item,
+    db_repository=item_db_repository,
+    cache_repository=item_cache_repository,
+    service_name="item",
+)
@@ -10,11 +10,11 @@ from app.core.messaging.emails import send_test_email
 from app.core.ratelimit import limiter
 from app.schemas import create_successful_response, Msg, SuccessfulResponse
 from app.src.authen.dependencies import get_current_active_authorized
-from app.src.users.db_models import User
+from app.src.users.principal import UserPrincipal
 
 router = APIRouter()
 
-CurrentUser = Annotated[User, Depends(get_current_active_authorized)]
+CurrentUser = Annotated[UserPrincipal, Depends(get_current_active_authorized)]
 
 
 # Calling this endpoint to see if the setup works.
@@ -9,12 +9,12 @@ from app.schemas import (
     SuccessfulResponse,
 )
 from app.src.authen.dependencies import get_current_active_authorized
-from app.src.users.db_models import User
+from app.src.users.principal import UserPrincipal
 from app.tasks import test_task as test_task_task
 
 router = APIRouter()
 
-CurrentUser = Annotated[User, Depends(get_current_active_authorized)]
+CurrentUser = Annotated[UserPrincipal, Depends(get_current_active_authorized)]
 
 
 @router.post("/test-task", response_model=SuccessfulResponse[Msg], status_code=201)
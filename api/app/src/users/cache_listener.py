@@ -0,0 +1,61 @@
+import asyncio
+import contextlib
+
+from loguru import logger
+
+from app.core.cache.cache_connections import async_cache_connection
+from app.core.settings import settings
+
+from .cache_repository import UserCacheRepository
+
+__all__ = ["UserCacheListener"]
+
+
+class UserCacheListener:
+    """Background task evicting local user snapshots invalidated by other workers."""
+
+    def __init__(self, cache_repository: UserCacheRepository) -> None:
+        self.cache_repository = cache_repository
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="user-cache-listener")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        self._deactivate()
+
+    def _deactivate(self) -> None:
+        self.cache_repository.local_cache_active = False
+        self.cache_repository.clear_local()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa: B902
+                logger.exception("user cache listener disconnected, reconnecting")
+
+            # Invalidations published while we are not subscribed are lost, go to Redis
+            self._deactivate()
+            await asyncio.sleep(settings.REDIS_CACHE.USER_LOCAL_CACHE_RETRY_INTERVAL)
+
+    async def _listen(self) -> None:
+        async with async_cache_connection.session() as cache_connection:
+            async with cache_connection.pubsub() as pubsub:
+                await self.cache_repository.subscribe_invalidations(pubsub=pubsub)
+                self.cache_repository.local_cache_active = True
+
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    self.cache_repository.evict_local(message["data"].decode())
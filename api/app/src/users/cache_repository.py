@@ -1,13 +1,36 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
 from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
 
 from app.core.settings import settings
 from app.src.cache_repository import BaseCacheRepository
 
 from .db_models import User
+from .principal import UserPrincipal
 from .schemas import UserInDB
 
 
 class UserCacheRepository(BaseCacheRepository):
+    """Users cached in Redis by email, fronted by a per-process LRU of user snapshots.
+
+    The auth path reads `UserPrincipal`s, which are immutable and shared from the local
+    cache; `get_cache_by_email` still builds a detached `User` for callers needing one.
+
+    The local cache is only used while a `UserCacheListener` is subscribed to the
+    invalidations published by `delete_cache_by_email`; entries also expire after
+    `REDIS_CACHE.USER_LOCAL_CACHE_TTL` seconds.
+    """
+
+    def __init__(self, repository_name: str) -> None:
+        super().__init__(repository_name=repository_name)
+        self.local_cache_active = False
+        self._local: OrderedDict[str, tuple[float, UserInDB, UserPrincipal]] = OrderedDict()
+        # Bumped on every eviction, a Redis read that raced one is not cached locally
+        self._local_generation = 0
+
     ## Common
     @staticmethod
     def _generate_redis_user_by_email(
@@ -15,30 +38,207 @@ class UserCacheRepository(BaseCacheRepository):
     ) -> str:  # pylint: disable=redefined-builtin
         return f"Cache:User:{email}"
 
+    @staticmethod
+    def _generate_redis_security_changes() -> str:
+        return "Cache:User:security_changes"
+
+    @staticmethod
+    def _generate_redis_invalidation_channel() -> str:
+        return "Channel:User:invalidate"
+
+    ## Local cache
+
+    def _get_local(self, email: str) -> tuple[UserInDB, UserPrincipal] | None:
+        if not self.local_cache_active:
+            return None
+
+        cached = self._local.get(email)
+        if cached is None:
+            return None
+        if time.monotonic() >= cached[0]:
+            del self._local[email]
+            return None
+
+        self._local.move_to_end(email)
+        return cached[1], cached[2]
+
+    def _set_local(
+        self, email: str, user_in_db: UserInDB, principal: UserPrincipal, generation: int
+    ) -> None:
+        if not self.local_cache_active or generation != self._local_generation:
+            return
+
+        self._local[email] = (
+            time.monotonic() + settings.REDIS_CACHE.USER_LOCAL_CACHE_TTL,
+            user_in_db,
+            principal,
+        )
+        self._local.move_to_end(email)
+        if len(self._local) > settings.REDIS_CACHE.USER_LOCAL_CACHE_SIZE:
+            self._local.popitem(last=False)
+
+    def evict_local(self, email: str) -> None:
+        self._local_generation += 1
+        self._local.pop(email, None)
+
+    def clear_local(self) -> None:
+        self._local_generation += 1
+        self._local.clear()
+
+    async def subscribe_invalidations(self, pubsub: PubSub) -> None:
+        await self.subscribe(pubsub=pubsub, channel=self._generate_redis_invalidation_channel())
+
     ## Cache
     async def create_cache_by_email(self, connection: Redis, db_obj: User) -> None:
+        generation = self._local_generation
         user_in_db = UserInDB.model_validate(db_obj)
         await self.create(
             connection=connection,
             key=self._generate_redis_user_by_email(db_obj.email),
-            value=user_in_db.model_dump_json(),
+            value=user_in_db.model_dump(mode="json"),
             ttl=settings.REDIS_CACHE.USER_TTL,
         )
+        self._set_local(
+            db_obj.email, user_in_db, UserPrincipal.from_user(user_in_db), generation
+        )
 
-    async def get_cache_by_email(self, connection: Redis, obj_email: str) -> User | None:
-        db_obj = await self.get(
+    async def _get_snapshot(
+        self, connection: Redis, obj_email: str
+    ) -> tuple[UserInDB, UserPrincipal] | None:
+        cached = self._get_local(obj_email)
+        if cached is not None:
+            return cached
+
+        generation = self._local_generation
+        db_obj = await self.get_and_touch(
             connection=connection,
             key=self._generate_redis_user_by_email(obj_email),
             ttl=settings.REDIS_CACHE.USER_TTL,
         )
         if not db_obj:
             return None
-        user_in_db = UserInDB.model_validate_json(db_obj)
-        obj_in_data = user_in_db.model_dump()
-        return User(**obj_in_data)
+
+        user_in_db = UserInDB.model_validate(db_obj)
+        principal = UserPrincipal.from_user(user_in_db)
+        self._set_local(obj_email, user_in_db, principal, generation)
+        return user_in_db, principal
+
+    async def get_cache_by_email(self, connection: Redis, obj_email: str) -> User | None:
+        cached = await self._get_snapshot(connection=connection, obj_email=obj_email)
+        if cached is None:
+            return None
+
+        # Snapshots are shared, hand out a fresh instance
+        return User(**cached[0].model_dump())
+
+    async def get_principal_by_email(
+        self, connection: Redis, obj_email: str
+    ) -> UserPrincipal | None:
+        cached = await self._get_snapshot(connection=connection, obj_email=obj_email)
+        return None if cached is None else cached[1]
 
     async def delete_cache_by_email(self, connection: Redis, obj_email: str) -> None:
-        await self.delete(connection=connection, key=self._generate_redis_user_by_email(obj_email))
+        self.evict_local(obj_email)
+        async with connection.pipeline(transaction=False) as pipe:
+            await (
+                pipe.delete(self._generate_redis_user_by_email(obj_email))
+                .publish(self._generate_redis_invalidation_channel(), obj_email)
+                .execute()
+            )
+
+    ## Bulk cache
+
+    async def create_cache_by_emails(self, connection: Redis, db_objs: list[User]) -> None:
+        generation = self._local_generation
+        users_in_db = [UserInDB.model_validate(db_obj) for db_obj in db_objs]
+        await self.set_many(
+            connection=connection,
+            values={
+                self._generate_redis_user_by_email(db_obj.email): user_in_db.model_dump(mode="json")
+                for db_obj, user_in_db in zip(db_objs, users_in_db, strict=True)
+            },
+            ttl=settings.REDIS_CACHE.USER_TTL,
+        )
+        for db_obj, user_in_db in zip(db_objs, users_in_db, strict=True):
+            self._set_local(
+                db_obj.email, user_in_db, UserPrincipal.from_user(user_in_db), generation
+            )
+
+    async def get_cache_by_emails(
+        self, connection: Redis, obj_emails: list[str]
+    ) -> list[User | None]:
+        """Cached users in input order, None for the ones not cached."""
+        snapshots = [self._get_local(email) for email in obj_emails]
+        missing = [
+            email for email, cached in zip(obj_emails, snapshots, strict=True) if cached is None
+        ]
+
+        if missing:
+            generation = self._local_generation
+            values = await self.get_many(
+                connection=connection,
+                keys=[self._generate_redis_user_by_email(email) for email in missing],
+                ttl=settings.REDIS_CACHE.USER_TTL,
+            )
+            fetched: dict[str, tuple[UserInDB, UserPrincipal]] = {}
+            for email, value in zip(missing, values, strict=True):
+                if not value:
+                    continue
+                user_in_db = UserInDB.model_validate(value)
+                principal = UserPrincipal.from_user(user_in_db)
+                self._set_local(email, user_in_db, principal, generation)
+                fetched[email] = (user_in_db, principal)
+            snapshots = [
+                cached or fetched.get(email)
+                for email, cached in zip(obj_emails, snapshots, strict=True)
+            ]
+
+        return [None if cached is None else User(**cached[0].model_dump()) for cached in snapshots]
+
+    async def delete_cache_by_emails(self, connection: Redis, obj_emails: list[str]) -> None:
+        if not obj_emails:
+            return
+        for email in obj_emails:
+            self.evict_local(email)
+        async with connection.pipeline(transaction=False) as pipe:
+            pipe.delete(*[self._generate_redis_user_by_email(email) for email in obj_emails])
+            for email in obj_emails:
+                pipe.publish(self._generate_redis_invalidation_channel(), email)
+            await pipe.execute()
+
+    ## Security changes, sorted set of email -> timestamp of the user's last security change
+
+    async def add_security_change(
+        self, connection: Redis, obj_email: str, changed_at: datetime
+    ) -> None:
+        # Changes older than an access token lifetime can't revoke anything anymore
+        expired_at = datetime.now(timezone.utc) - timedelta(
+            minutes=settings.TOKEN.ACCESS_TOKEN_EXPIRE_DURATION
+        )
+        async with connection.pipeline(transaction=True) as pipe:
+            await (
+                pipe.zadd(
+                    self._generate_redis_security_changes(),
+                    {obj_email: changed_at.timestamp()},
+                    gt=True,
+                )
+                .zremrangebyscore(
+                    self._generate_redis_security_changes(), "-inf", expired_at.timestamp()
+                )
+                .execute()
+            )
+
+    async def get_security_changes(
+        self, connection: Redis, since: float | None = None
+    ) -> dict[str, float]:
+        """Users whose last security change is at or after the `since` timestamp."""
+        changes = await connection.zrangebyscore(
+            self._generate_redis_security_changes(),
+            "-inf" if since is None else since,
+            "+inf",
+            withscores=True,
+        )
+        return {email.decode(): changed_at for email, changed_at in changes}
 
 
 user_cache_repository = UserCacheRepository(repository_name="user")
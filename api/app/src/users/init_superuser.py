@@ -1,8 +1,8 @@
-import casbin
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.settings import settings
 from app.src import db_models  # type: ignore # noqa: F401
+from app.src.author.casbin_enforcer import CasbinEnforcer
 from app.src.author.services import casbin_service
 
 from .schemas import UserCreate
@@ -15,7 +15,7 @@ from .services import user_service
 
 async def init_superuser(
     db: AsyncSession,
-    enforcer: casbin.AsyncEnforcer,
+    enforcer: CasbinEnforcer,
 ) -> bool:
     # Tables should be created with Alembic migrations
     # But if you don't want to use migrations, create
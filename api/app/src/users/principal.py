@@ -0,0 +1,29 @@
+from dataclasses import dataclass
+from typing import Any
+
+__all__ = ["UserPrincipal"]
+
+
+@dataclass(frozen=True, slots=True)
+class UserPrincipal:
+    """The authenticated user as seen by authentication and authorization.
+
+    Built from the user cache or from a stateless access token, never an ORM instance;
+    handlers that need the user row load it with `user_service.get(db, id=principal.id)`.
+    """
+
+    id: int
+    email: str
+    is_active: bool
+    # Not carried by stateless access tokens
+    account_status: str | None = None
+
+    @classmethod
+    def from_user(cls, user: Any) -> "UserPrincipal":
+        """Build the principal from a `User` row or a `UserInDB` snapshot."""
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_active=bool(user.is_active),
+            account_status=user.account_status,
+        )
@@ -1,6 +1,5 @@
 from typing import Annotated, Any
 
-import casbin
 from fastapi import Body, Depends, HTTPException
 from fastapi import status as http_status
 from fastapi_pagination.api import create_page, resolve_params
@@ -12,28 +11,38 @@ from app.core.http.api_router import APIRouter
 from app.core.settings import settings
 from app.errors import api_disabled
 from app.schemas import create_successful_response, SuccessfulResponse
+from app.src.author.casbin_enforcer import CasbinEnforcer
 from app.src.authen.dependencies import (
     get_current_active_authorized,
 )
-from app.src.dependencies import get_async_cache, get_casbin_enforcer, get_db
+from app.src.dependencies import (
+    get_async_cache,
+    get_casbin_enforcer,
+    get_db,
+    get_db_readonly,
+    get_db_replica,
+)
 from app.utils import get_limit_offset, get_params
 
-from .. import db_models, schemas
+from .. import schemas
 from ..errors import exists_email, user_not_found
+from ..principal import UserPrincipal
 from ..services import user_service
 
 router = APIRouter()
 
 Db = Annotated[AsyncSession, Depends(get_db)]
+ReadonlyDb = Annotated[AsyncSession, Depends(get_db_readonly)]
+ReplicaDb = Annotated[AsyncSession, Depends(get_db_replica)]
 CacheConnection = Annotated[Redis, Depends(get_async_cache)]
-CurrentUser = Annotated[db_models.User, Depends(get_current_active_authorized)]
-CasbinEnforcer = Annotated[casbin.AsyncEnforcer, Depends(get_casbin_enforcer)]
+CurrentUser = Annotated[UserPrincipal, Depends(get_current_active_authorized)]
+Enforcer = Annotated[CasbinEnforcer, Depends(get_casbin_enforcer)]
 
 
 @router.get("/", response_model=SuccessfulResponse[Page[schemas.User]])
 async def read_users(
     *,
-    db: Db,
+    db: ReplicaDb,
     params: Annotated[Params, Depends(get_params)],
     current_user: CurrentUser,
 ) -> Any:
@@ -51,7 +60,7 @@ async def read_users(
 async def create_user(
     *,
     db: Db,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     user_in: schemas.UserCreate,
     current_user: CurrentUser,
 ) -> Any:
@@ -102,19 +111,27 @@ async def update_user_me(
 @router.get("/me", response_model=SuccessfulResponse[schemas.User])
 async def read_user_me(
     *,
+    db: ReadonlyDb,
+    cache_connection: CacheConnection,
     current_user: CurrentUser,
 ) -> Any:
     """
     Get current user.
     """
-    return create_successful_response(data=current_user)
+    # Served from the user cache the principal was just read from, without a DB round trip
+    user = await user_service.get_by_email(
+        db, cache_connection=cache_connection, email=current_user.email
+    )
+    if not user:
+        raise user_not_found()
+    return create_successful_response(data=user)
 
 
 @router.post("/open", response_model=SuccessfulResponse[schemas.User])
 async def create_user_open(
     *,
     db: Db,
-    casbin_enforcer: CasbinEnforcer,
+    casbin_enforcer: Enforcer,
     user_in: schemas.UserCreateOpen,
 ) -> Any:
     """
@@ -140,8 +157,12 @@ async def update_last_login(
     """
     Update last login date for the current user.
     """
+    user = await user_service.get(db, id=current_user.id)
+    if not user:
+        raise user_not_found()
+
     user = await user_service.update_last_login(
-        db=db, cache_connection=cache_connection, db_obj=current_user
+        db=db, cache_connection=cache_connection, db_obj=user
     )
     return create_successful_response(data=user)
 
@@ -157,8 +178,12 @@ async def enable_two_factor(
     """
     Enable two-factor authentication for the current user.
     """
+    user = await user_service.get(db, id=current_user.id)
+    if not user:
+        raise user_not_found()
+
     user = await user_service.enable_two_factor(
-        db=db, cache_connection=cache_connection, db_obj=current_user, secret=secret
+        db=db, cache_connection=cache_connection, db_obj=user, secret=secret
     )
     return create_successful_response(data=user)
 
@@ -173,8 +198,12 @@ async def disable_two_factor(
     """
     Disable two-factor authentication for the current user.
     """
+    user = await user_service.get(db, id=current_user.id)
+    if not user:
+        raise user_not_found()
+
     user = await user_service.disable_two_factor(
-        db=db, cache_connection=cache_connection, db_obj=current_user
+        db=db, cache_connection=cache_connection, db_obj=user
     )
     return create_successful_response(data=user)
 
@@ -184,7 +213,7 @@ async def read_user_by_id(
     *,
     user_id: int,
     current_user: CurrentUser,
-    db: Db,
+    db: ReadonlyDb,
 ) -> Any:
     """
     Get a specific user by id.
@@ -192,8 +221,6 @@ async def read_user_by_id(
     user = await user_service.get(db, id=user_id)
     if not user:
         raise user_not_found()
-    if user == current_user:
-        return create_successful_response(data=user)
     return create_successful_response(data=user)
 
 
@@ -1,7 +1,8 @@
+from __future__ import annotations
+
 from datetime import datetime
-from typing import Any, Sequence, Type
+from typing import Any, Sequence, Type, TYPE_CHECKING
 
-import casbin
 from dateutil import tz
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -9,13 +10,24 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.auth.security import get_password_hash
 from app.core.messaging.emails import send_new_account_email
 from app.core.settings import settings
+from app.src.author.policy_freshness import ensure_fresh_policy
 from app.src.service import ServiceBase
 
 from .cache_repository import user_cache_repository, UserCacheRepository
 from .db_models import User
 from .db_repository import user_db_repository, UserDbRepository
+from .principal import UserPrincipal
 from .schemas import UserCreate, UserUpdate
 
+if TYPE_CHECKING:
+    from app.src.author.casbin_enforcer import CasbinEnforcer
+
+
+# Changing these invalidates the access tokens issued to the user
+SECURITY_FIELDS = frozenset(
+    {"password", "hashed_password", "is_active", "account_status", "email"}
+)
+
 
 class UserService(ServiceBase):
     def __init__(
@@ -51,11 +63,11 @@ class UserService(ServiceBase):
         db: AsyncSession,
         *,
         obj_in: UserCreate,
-        enforcer: casbin.AsyncEnforcer,
+        enforcer: CasbinEnforcer,
     ) -> User:
         user = await self.create(db, obj_in=obj_in)
 
-        await enforcer.load_policy()
+        await ensure_fresh_policy(enforcer, check_remote=True)
         await enforcer.add_role_for_user(user=obj_in.email, role=settings.CASBIN.DEFAULT_ROLE)
 
         if settings.EMAIL.ENABLED and obj_in.email:
@@ -71,7 +83,7 @@ class UserService(ServiceBase):
         self,
         db: AsyncSession,
         cache_connection: Redis | None,
-        enforcer: casbin.AsyncEnforcer,
+        enforcer: CasbinEnforcer,
         email: str,
         **kwargs: Any | None,
     ) -> tuple[User, bool]:
@@ -87,7 +99,7 @@ class UserService(ServiceBase):
         )
 
         if created:
-            await enforcer.load_policy()
+            await ensure_fresh_policy(enforcer, check_remote=True)
             await enforcer.add_role_for_user(user=email, role=settings.CASBIN.DEFAULT_ROLE)
 
         if cache_connection is not None and user:
@@ -128,6 +140,7 @@ class UserService(ServiceBase):
     async def get_by_email(
         self, db: AsyncSession, cache_connection: Redis | None, *, email: str
     ) -> User | None:
+        # Not a `cached_query`: the repository fronts these entries with its local cache
         if cache_connection is not None:
             cached_user = await self.cache_repository.get_cache_by_email(
                 connection=cache_connection, obj_email=email
@@ -143,6 +156,22 @@ class UserService(ServiceBase):
             )
         return user
 
+    async def get_principal_by_email(
+        self, db: AsyncSession, cache_connection: Redis, *, email: str
+    ) -> UserPrincipal | None:
+        """Return the user as an immutable principal, the cache-hit path builds no ORM object."""
+        principal = await self.cache_repository.get_principal_by_email(
+            connection=cache_connection, obj_email=email
+        )
+        if principal is not None:
+            return principal
+
+        user = await self.db_repository.get_by_email(db=db, email=email)
+        if not user:
+            return None
+        await self.cache_repository.create_cache_by_email(connection=cache_connection, db_obj=user)
+        return UserPrincipal.from_user(user)
+
     ## Delete
 
     async def delete(self, db: AsyncSession, cache_connection: Redis, db_obj: User) -> None:
@@ -150,6 +179,25 @@ class UserService(ServiceBase):
             connection=cache_connection, obj_email=db_obj.email
         )
         await self.db_repository.delete(db=db, db_obj=db_obj)
+        await self.add_security_change(cache_connection=cache_connection, email=db_obj.email)
+
+    ## Security changes
+
+    async def add_security_change(self, cache_connection: Redis, email: str) -> None:
+        """Revoke the access tokens issued to the user until now.
+
+        Call it once the change is committed, a token issued in between would survive it.
+        """
+        await self.cache_repository.add_security_change(
+            connection=cache_connection, obj_email=email, changed_at=datetime.now(tz.tzutc())
+        )
+
+    async def get_security_changes(
+        self, cache_connection: Redis, since: float | None = None
+    ) -> dict[str, float]:
+        return await self.cache_repository.get_security_changes(
+            connection=cache_connection, since=since
+        )
 
     ## Update
 
@@ -160,14 +208,19 @@ class UserService(ServiceBase):
         db_obj: User,
         obj_in: UserUpdate | dict[str, Any],
     ) -> User:
+        """Evict the cached user and revoke its tokens when a `SECURITY_FIELDS` field changes.
+
+        Every user mutation but `delete` goes through it.
+        """
         await self.cache_repository.delete_cache_by_email(
             connection=cache_connection, obj_email=db_obj.email
         )
-        return await self.db_repository.update(
-            db=db,
-            db_obj=db_obj,
-            update_data=(obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True)),
-        )
+        update_data = obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True)
+        email = db_obj.email
+        user = await self.db_repository.update(db=db, db_obj=db_obj, update_data=update_data)
+        if not SECURITY_FIELDS.isdisjoint(update_data):
+            await self.add_security_change(cache_connection=cache_connection, email=email)
+        return user
 
     async def update_user_me(
         self,
@@ -179,9 +232,6 @@ class UserService(ServiceBase):
         default_currency: str | None = None,
         language_preference: str | None = None,
     ) -> User:
-        await self.cache_repository.delete_cache_by_email(
-            connection=cache_connection, obj_email=db_obj.email
-        )
         user_in = UserUpdate()
         if full_name is not None:
             user_in.full_name = full_name
@@ -205,13 +255,11 @@ class UserService(ServiceBase):
         db_obj: User,
         new_password: str,
     ) -> User:
-        await self.cache_repository.delete_cache_by_email(
-            connection=cache_connection, obj_email=db_obj.email
-        )
-        return await self.db_repository.update(
-            db=db,
+        return await self.update(
+            db,
+            cache_connection=cache_connection,
             db_obj=db_obj,
-            update_data={"hashed_password": get_password_hash(new_password)},
+            obj_in={"hashed_password": get_password_hash(new_password)},
         )
 
     async def update_last_login(
@@ -221,13 +269,11 @@ class UserService(ServiceBase):
         db_obj: User,
     ) -> User:
         """Update the last_login_date of a user to current time."""
-        await self.cache_repository.delete_cache_by_email(
-            connection=cache_connection, obj_email=db_obj.email
-        )
-        return await self.db_repository.update(
-            db=db,
+        return await self.update(
+            db,
+            cache_connection=cache_connection,
             db_obj=db_obj,
-            update_data={"last_login_date": datetime.now(tz.tzlocal())},
+            obj_in={"last_login_date": datetime.now(tz.tzlocal())},
         )
 
     async def update_account_status(
@@ -238,13 +284,11 @@ class UserService(ServiceBase):
         status: str,
     ) -> User:
         """Update the account status of a user."""
-        await self.cache_repository.delete_cache_by_email(
-            connection=cache_connection, obj_email=db_obj.email
-        )
-        return await self.db_repository.update(
-            db=db,
+        return await self.update(
+            db,
+            cache_connection=cache_connection,
             db_obj=db_obj,
-            update_data={"account_status": status},
+            obj_in={"account_status": status},
         )
 
     async def enable_two_factor(
@@ -255,13 +299,11 @@ class UserService(ServiceBase):
         secret: str,
     ) -> User:
         """Enable two-factor authentication for a user."""
-        await self.cache_repository.delete_cache_by_email(
-            connection=cache_connection, obj_email=db_obj.email
-        )
-        return await self.db_repository.update(
-            db=db,
+        return await self.update(
+            db,
+            cache_connection=cache_connection,
             db_obj=db_obj,
-            update_data={"two_factor_enabled": True, "two_factor_secret": secret},
+            obj_in={"two_factor_enabled": True, "two_factor_secret": secret},
         )
 
     async def disable_two_factor(
@@ -271,13 +313,11 @@ class UserService(ServiceBase):
         db_obj: User,
     ) -> User:
         """Disable two-factor authentication for a user."""
-        await self.cache_repository.delete_cache_by_email(
-            connection=cache_connection, obj_email=db_obj.email
-        )
-        return await self.db_repository.update(
-            db=db,
+        return await self.update(
+            db,
+            cache_connection=cache_connection,
             db_obj=db_obj,
-            update_data={"two_factor_enabled": False, "two_factor_secret": None},
+            obj_in={"two_factor_enabled": False, "two_factor_secret": None},
         )
 
 